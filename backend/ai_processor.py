@@ -1,27 +1,81 @@
 import httpx
 import json
 import base64
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from PIL import Image
 import io
 from .screenshot_utils import ScreenshotProcessor
+from .image_pipeline import ImageExecutor, grid_for_model
+from .singleflight import SingleFlight, content_key
+from .ollama_scheduler import OllamaScheduler, SchedulerOverloaded
+from .ollama_pool import OllamaPool, NoHealthyBackend
+from .prompt_builder import serialize_dom_for_prompt
+from .dom_ranking import rank_elements
+from .cancellation import GenerationStats
+from .http_client import DeadlineExceeded, create_ollama_client, deadline_timeout, within_deadline
+from .circuit_breaker import CircuitBreaker, CircuitOpen
+from .metrics import record_ollama_timings
+from .analysis_schema import (
+    ANALYSIS_SCHEMA, INTERPRETATION_SCHEMA, PageAnalysis, CommandInterpretation, SchemaParser
+)
 
 class AIProcessor:
-    def __init__(self, ollama_url: str = "http://localhost:11434"):
+    def __init__(self, ollama_url: str = "http://localhost:11434", image_executor: ImageExecutor = None,
+                 model: str = "qwen2.5vl:7b", vision_token_budget: int = 1024,
+                 scheduler: OllamaScheduler = None, pool: OllamaPool = None, keep_alive: str = "30m",
+                 dom_token_budget: int = 400, dom_top_k: int = 20, client: httpx.AsyncClient = None,
+                 breaker: CircuitBreaker = None):
         self.ollama_url = ollama_url  # Your friend's Ollama server
-        self.client = httpx.AsyncClient(timeout=30.0)  # HTTP client for API calls
+        # Backends to route across; pass main's pool to share routing + health state
+        self.pool = pool or OllamaPool([ollama_url], excluded=(DeadlineExceeded,))
+        self.model = model
+        self.keep_alive = keep_alive  # Keep the model loaded between requests
+        self.dom_token_budget = dom_token_budget  # Prompt space for the element listing
+        self.dom_top_k = dom_top_k  # Best-ranked elements considered for the prompt
+        # Resize screenshots onto the model's patch grid (None for models without one)
+        self.vision_grid = grid_for_model(model, vision_token_budget)
+        # HTTP client for API calls; pass the app's shared client to reuse its connection pool
+        self._owns_client = client is None
+        self.client = client or create_ollama_client()
         self.screenshot_processor = ScreenshotProcessor()
+        # Image decode/resize/encode runs here instead of on the event loop
+        self.image_executor = image_executor or ImageExecutor()
+        # Concurrent identical requests share one generation (see stats())
+        self.flights = SingleFlight()
+        # Bounded concurrency/queue in front of Ollama; pass main's scheduler to share the limits
+        self.scheduler = scheduler or OllamaScheduler()
+        # Fail fast to the fallback while Ollama is down; pass main's breaker to share its state
+        self.breaker = breaker or CircuitBreaker(excluded=(SchedulerOverloaded, DeadlineExceeded))
+        # Typed validation of model output (+ schema failure counters)
+        self.analysis_parser = SchemaParser(PageAnalysis)
+        # Keep null fields: callers read result["selected_action_id"] even when nothing matched
+        self.interpretation_parser = SchemaParser(CommandInterpretation, exclude_none=False)
+        # Completed / cancelled / timed-out generations
+        self.generations = GenerationStats()
     
-    async def analyze_screenshot(self, screenshot_data: str, dom_elements: List[Dict]) -> Dict[str, Any]:
+    async def analyze_screenshot(self, screenshot_data: str, dom_elements: List[Dict],
+                                 deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         MAIN FUNCTION: Analyze webpage screenshot + DOM elements
         Input: base64 screenshot + list of interactive elements
         Output: {"page_type": "ecommerce", "actions": [...], "page_summary": "..."}
+        deadline: seconds the caller will wait; past it the fallback is returned.
+        Cancelling the calling task (e.g. client disconnected) aborts the generation.
         """
+        # Same screenshot + DOM already being analyzed? Wait for that result instead
+        return await self.flights.do(
+            content_key(screenshot_data, dom_elements),
+            self._analyze_screenshot, screenshot_data, dom_elements, deadline
+        )
+    
+    async def _analyze_screenshot(self, screenshot_data: str, dom_elements: List[Dict],
+                                  deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Uncoalesced analysis (one Ollama generation per call)"""
         
-        # 1. Prepare image for Ollama
-        image = self.screenshot_processor.decode_base64_screenshot(screenshot_data)
-        processed_img = self.screenshot_processor.preprocess_image_for_llm(image)
+        # 1. Prepare image for Ollama (off the event loop)
+        processed_img = await self.image_executor.run(
+            ScreenshotProcessor.prepare_base64_for_llm, screenshot_data, self.vision_grid
+        )
         
         # 2. Create readable summary of DOM elements
         dom_summary = self._summarize_dom_elements(dom_elements)
@@ -65,37 +119,64 @@ class AIProcessor:
             }
         ]
         
-        response = await self.client.post(
-            f"{self.ollama_url}/api/chat",  # Ollama chat endpoint
-            json={
-                "model": "qwen2.5vl:7b",
-                "messages": messages,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,  # Lower = more deterministic
-                    "num_predict": 1000   # Max tokens to generate
-                }
-            }
-        )
+        try:
+            async with self.breaker.guard(), self.scheduler.slot(deadline) as remaining, \
+                    self.pool.request() as backend, self.generations.track(), within_deadline(remaining):
+                response = await self.client.post(
+                    f"{backend.url}/api/chat",  # Ollama chat endpoint
+                    json={
+                        "model": self.model,
+                        "messages": messages,
+                        "stream": False,
+                        "keep_alive": self.keep_alive,
+                        "format": ANALYSIS_SCHEMA,  # Ollama constrains output to this JSON schema
+                        "options": {
+                            "temperature": 0.3,  # Lower = more deterministic
+                            "num_predict": 1000   # Max tokens to generate
+                        }
+                    },
+                    timeout=deadline_timeout(self.client, remaining)  # Capped by what is left of the deadline
+                )
+                if response.status_code >= 500:
+                    response.raise_for_status()  # Counts against the backend and the circuit
+        except (SchedulerOverloaded, NoHealthyBackend, CircuitOpen, TimeoutError, httpx.HTTPError):
+            # Queue too deep / Ollama down or erroring / deadline hit - use the heuristic
+            return self._create_fallback_analysis(dom_elements)
         
         # 5. Parse Ollama's response
         if response.status_code == 200:
             result = response.json()
             content = result["message"]["content"]
+            record_ollama_timings(result, "analyze")  # load / prompt eval / generation histograms
             
-            try:
-                parsed = json.loads(content)  # Try to parse as JSON
+            parsed = self.analysis_parser.parse(content)  # Validate against PageAnalysis
+            if parsed is not None:
                 # Add actual element selectors to actions
-                parsed = self._enrich_with_element_data(parsed, dom_elements)
-                return parsed
-            except json.JSONDecodeError:
-                # If Ollama doesn't return clean JSON, extract it
-                return self._extract_json_from_text(content, dom_elements)
-        else:
-            # Fallback if Ollama fails
-            return await self._fallback_analysis(dom_elements)
+                return self._enrich_with_element_data(parsed, dom_elements)
+        
+        # Fallback if Ollama fails or the output doesn't match the schema
+        return self._create_fallback_analysis(dom_elements)
     
-    async def interpret_user_command(self, user_command: str, page_context: Dict, available_actions: List[Dict]) -> Dict:
+    async def aclose(self):
+        """Close the HTTP client if this processor created it (a shared one belongs to the app)"""
+        if self._owns_client:
+            await self.client.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "singleflight": self.flights.stats(),
+            "scheduler": self.scheduler.stats(),
+            "backends": self.pool.stats(),
+            "generations": self.generations.stats(),
+            "circuit": self.breaker.stats(),
+            "schema": {
+                "analysis": self.analysis_parser.stats(),
+                "interpretation": self.interpretation_parser.stats()
+            }
+        }
+    
+    async def interpret_user_command(self, user_command: str, page_context: Dict, available_actions: List[Dict],
+                                     deadline: Optional[float] = None) -> Dict:
         """
         Match user's voice command to available actions
         Input: "search for laptops", page analysis, available actions
@@ -122,32 +203,44 @@ class AIProcessor:
         """
         
         # Call Ollama for text-only reasoning
-        response = await self.client.post(
-            f"{self.ollama_url}/api/generate",
-            json={
-                "model": "qwen2.5vl:7b",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.2}
-            }
-        )
+        try:
+            async with self.breaker.guard(), self.scheduler.slot(deadline) as remaining, \
+                    self.pool.request() as backend, self.generations.track(), within_deadline(remaining):
+                response = await self.client.post(
+                    f"{backend.url}/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "stream": False,
+                        "keep_alive": self.keep_alive,
+                        "format": INTERPRETATION_SCHEMA,
+                        "options": {"temperature": 0.2}
+                    },
+                    timeout=deadline_timeout(self.client, remaining)
+                )
+                if response.status_code >= 500:
+                    response.raise_for_status()
+        except (SchedulerOverloaded, NoHealthyBackend, CircuitOpen, TimeoutError, httpx.HTTPError):
+            return self._keyword_match(user_command, available_actions)
         
         if response.status_code == 200:
             result = response.json()
             content = result["response"]
+            record_ollama_timings(result, "interpret")
             
-            try:
-                return json.loads(content)
-            except:
-                # Simple keyword matching fallback
-                return self._keyword_match(user_command, available_actions)
+            parsed = self.interpretation_parser.parse(content)
+            if parsed is not None:
+                return parsed
+        
+        # Simple keyword matching fallback
+        return self._keyword_match(user_command, available_actions)
     
     def _summarize_dom_elements(self, elements: List[Dict]) -> str:
         """Format DOM elements for the LLM prompt"""
-        summary = []
-        for i, elem in enumerate(elements[:20]):  # Limit to 20 elements
-            summary.append(f"{i}. {elem.get('tag', '')} - Text: '{elem.get('text', '')}' - Type: {elem.get('type', '')}")
-        return "\n".join(summary)
+        # Same ranking + compact, token-budgeted format as main.py's prompt
+        ranked = rank_elements(elements, self.dom_top_k)
+        summary, _ = serialize_dom_for_prompt(elements, self.dom_token_budget, order=ranked)
+        return summary
     
     def _enrich_with_element_data(self, analysis: Dict, dom_elements: List[Dict]) -> Dict:
         """Add real CSS selectors and bounds to actions"""
@@ -160,28 +253,17 @@ class AIProcessor:
                 action["bounds"] = elem.get("bounds", {})  # Screen position
         return analysis
     
-    def _extract_json_from_text(self, text: str, dom_elements: List[Dict]) -> Dict:
-        """Fallback: try to find JSON in Ollama's text response"""
-        import re
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except:
-                pass
-        
-        # Ultimate fallback: just pick first 3 elements
-        return self._create_fallback_analysis(dom_elements)
-    
     def _create_fallback_analysis(self, dom_elements: List[Dict]) -> Dict:
         """Create basic analysis when everything else fails"""
         actions = []
-        for i, elem in enumerate(dom_elements[:3]):
+        # Same top 3 as main.py's fallback: the prompt's heuristic ranking, not document order
+        for n, i in enumerate(rank_elements(dom_elements, 3)):
+            elem = dom_elements[i]
             actions.append({
-                "id": f"fallback_{i}",
+                "id": f"fallback_{n}",
                 "label": elem.get('text', f"Action {i}")[:50],
                 "element_index": i,
-                "confidence": 0.7 - (i * 0.1)
+                "confidence": 0.7 - (n * 0.1)
             })
         
         return {
@@ -0,0 +1,85 @@
+import re
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, Field, ValidationError
+
+
+class Action(BaseModel):
+    id: str
+    label: str
+    description: str = ""
+    element_index: int = Field(ge=0)
+    confidence: float = Field(ge=0.0, le=1.0)
+    reasoning: Optional[str] = None
+
+
+class PageAnalysis(BaseModel):
+    page_type: str
+    page_summary: str = ""
+    actions: List[Action]
+
+
+class CommandInterpretation(BaseModel):
+    selected_action_id: Optional[str] = None
+    confidence: float = Field(ge=0.0, le=1.0)
+    clarification_needed: bool
+    clarification_question: Optional[str] = None
+    reasoning: Optional[str] = None
+
+
+# JSON schemas for Ollama's "format" parameter (constrained decoding)
+ANALYSIS_SCHEMA = PageAnalysis.model_json_schema()
+INTERPRETATION_SCHEMA = CommandInterpretation.model_json_schema()
+
+
+class SchemaParser:
+    """
+    Parses model output into a typed payload and counts how often that works.
+    valid: clean JSON matching the schema
+    recovered: schema-valid JSON found inside surrounding text
+    failed: nothing usable (caller falls back)
+    exclude_none drops unset optional fields (e.g. an action's reasoning); turn
+    it off when callers index keys that may be null (selected_action_id)
+    """
+
+    def __init__(self, model: Type[BaseModel], exclude_none: bool = True):
+        self.model = model
+        self.exclude_none = exclude_none
+        self.valid = 0
+        self.recovered = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    def parse(self, content: str) -> Optional[Dict[str, Any]]:
+        """Validated payload as a plain dict, or None"""
+        try:
+            result = self.model.model_validate_json(content)
+            self.valid += 1
+            return result.model_dump(exclude_none=self.exclude_none)
+        except ValidationError as e:
+            error = e
+
+        # Constrained decoding should make this rare; keep it for older Ollama builds
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            try:
+                result = self.model.model_validate_json(json_match.group())
+                self.recovered += 1
+                return result.model_dump(exclude_none=self.exclude_none)
+            except ValidationError as e:
+                error = e
+
+        self.failed += 1
+        self.last_error = f"{error.error_count()} error(s): {error.errors()[0]['msg']}"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.valid + self.recovered + self.failed
+        return {
+            "schema": self.model.__name__,
+            "valid": self.valid,
+            "recovered": self.recovered,
+            "failed": self.failed,
+            "failure_rate": round(self.failed / total, 4) if total else 0.0,
+            "last_error": self.last_error
+        }
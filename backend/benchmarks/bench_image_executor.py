@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Event-loop latency while 32 screenshots are preprocessed at once.
+
+Run from the backend folder:
+    python benchmarks/bench_image_executor.py [--uploads 32] [--width 1920] [--height 4000]
+
+For each executor mode a ticker coroutine measures how late asyncio.sleep()
+wakes up (the delay any other request, e.g. /health, would see) while the
+uploads are pushed through ImageExecutor.run(prepare_image_bytes, ...).
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from image_pipeline import ImageExecutor, prepare_image_bytes  # noqa: E402
+
+TICK = 0.005  # 5 ms
+
+
+def make_screenshot(width: int, height: int, seed: int) -> bytes:
+    """Synthetic page capture: stripes of 'text' boxes, encoded as PNG like the Postman flow"""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(0, height, 40):
+        shade = (seed * 37 + y) % 200
+        draw.rectangle([20, y + 5, width - 20 - (y % 300), y + 30], fill=(shade, 80, 200 - shade))
+    buffered = io.BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def run_mode(mode: str, uploads: list, workers: int) -> dict:
+    executor = ImageExecutor(mode=mode, max_workers=workers)
+    # Warm the pool so process start-up isn't counted
+    await executor.run(prepare_image_bytes, uploads[0])
+
+    lags, stop = [], asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(executor.run(prepare_image_bytes, data) for data in uploads))
+    wall = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+    executor.shutdown()
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "wall_s": wall,
+        "ticks": len(lags),
+        "lag_p50_ms": statistics.median(lags),
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[-1],
+        "lag_max_ms": lags[-1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.uploads} screenshots of {args.width}x{args.height}...")
+    uploads = [make_screenshot(args.width, args.height, i) for i in range(args.uploads)]
+
+    print(f"{'mode':<8} {'wall s':>8} {'ticks':>6} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for mode in ImageExecutor.MODES:
+        r = await run_mode(mode, uploads, args.workers)
+        print(f"{r['mode']:<8} {r['wall_s']:>8.2f} {r['ticks']:>6} {r['lag_p50_ms']:>11.2f} {r['lag_p99_ms']:>11.2f} {r['lag_max_ms']:>11.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
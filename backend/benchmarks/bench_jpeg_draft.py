@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Full decode vs. draft-mode (DCT-scaled) decode for tall full-page captures.
+
+Run from the backend folder:
+    python benchmarks/bench_jpeg_draft.py [--width 1920] [--height 10000] [--runs 5]
+
+Each variant runs in a fresh interpreter so VmHWM (peak RSS, Linux) covers
+that variant alone; "baseline" only imports the pipeline and reads the file.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from image_pipeline import prepare_image  # noqa: E402
+
+CAPTURE_PATH = os.path.join(os.path.dirname(__file__), ".bench_capture.jpg")
+
+
+def make_capture(width: int, height: int):
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(0, height, 40):
+        shade = (y // 40 * 37) % 200
+        draw.rectangle([20, y + 5, width - 20 - (y % 500), y + 30], fill=(shade, 90, 200 - shade))
+    img.save(CAPTURE_PATH, format="JPEG", quality=90)
+
+
+def peak_rss_mb() -> float:
+    # VmHWM resets on exec, unlike ru_maxrss which a child inherits from its parent
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(variant: str, runs: int):
+    with open(CAPTURE_PATH, "rb") as f:
+        contents = f.read()
+
+    timings = []
+    result = {}
+    for _ in range(runs if variant != "baseline" else 1):
+        image = Image.open(io.BytesIO(contents))
+        start = time.perf_counter()
+        if variant != "baseline":
+            result = prepare_image(image, use_draft=(variant == "draft"))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(json.dumps({
+        "variant": variant,
+        "median_ms": timings[len(timings) // 2],
+        "peak_rss_mb": peak_rss_mb(),
+        "decode_scale": result.get("decode_scale", "-"),
+        "output": f"{result.get('width', '-')}x{result.get('height', '-')}",
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--worker", choices=["baseline", "full", "draft"])
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.runs)
+        return
+
+    print(f"Encoding {args.width}x{args.height} JPEG capture...")
+    make_capture(args.width, args.height)
+    print(f"{'variant':<9} {'median ms':>10} {'peak RSS MB':>12} {'scale':>6} {'output':>10}")
+    try:
+        for variant in ("baseline", "full", "draft"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", variant, "--runs", str(args.runs)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(out)
+            print(f"{r['variant']:<9} {r['median_ms']:>10.1f} {r['peak_rss_mb']:>12.1f} {r['decode_scale']:>6} {r['output']:>10}")
+    finally:
+        os.remove(CAPTURE_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Memory per stored session: raw json.loads dicts vs. CompactSession (dom_model.py).
+
+Run from the backend folder:
+    python benchmarks/bench_session_memory.py [--sessions 10000] [--elements 50] [--actions 5] [--enriched]
+
+Sessions look like what the extension sends (index, tag, text, type, id,
+classes, selector, fractional bounds) with an analysis as main.py stores it:
+actions point at elements by element_index only. --enriched adds the
+selector/element_type/bounds copies of ai_processor's _enrich_with_element_data,
+which CompactAction does not store twice. Every session is parsed from its
+own JSON string, as the API does. tracemalloc measures
+what each representation keeps alive; the round trip is checked on the first
+session.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dom_model import CompactSession, as_float32  # noqa: E402
+
+TAGS = ["a", "a", "a", "button", "button", "input", "select", "div", "span"]
+CLASS_POOL = ["btn", "btn-primary", "btn-sm", "nav-link", "card__title", "text-muted", "d-flex",
+              "shopee-searchbar__search-button", "product-card", "mt-2", "px-3", "is-active"]
+WORDS = ["Search", "Cart", "Login", "Sign up", "Add to cart", "Buy now", "Home", "Orders",
+         "Free shipping", "See all", "Next", "Vouchers", "Help", "Language"]
+
+
+def make_page(rng: random.Random, n_elements: int, n_actions: int, enriched: bool) -> str:
+    elements = []
+    for i in range(n_elements):
+        tag = rng.choice(TAGS)
+        classes = rng.sample(CLASS_POOL, rng.randint(1, 4))
+        elements.append({
+            "index": i,
+            "tag": tag,
+            "text": rng.choice(WORDS) if rng.random() < 0.8 else "",
+            "type": "submit" if tag == "button" else ("text" if tag == "input" else ""),
+            "id": f"el-{rng.randrange(10 ** 6)}" if rng.random() < 0.3 else "",
+            "classes": classes,
+            "selector": "." + ".".join(classes) + f":nth-of-type({i + 1})",
+            "bounds": {
+                "x": round(rng.uniform(0, 1800), 3),
+                "y": round(rng.uniform(0, 6000), 3),
+                "width": round(rng.uniform(20, 400), 3),
+                "height": round(rng.uniform(16, 60), 3)
+            }
+        })
+    actions = []
+    for n, idx in enumerate(rng.sample(range(n_elements), min(n_actions, n_elements))):
+        elem = elements[idx]
+        action = {
+            "id": f"action_{n}",
+            "label": elem["text"] or f"Action {n}",
+            "description": f"Click {elem['tag']}",
+            "element_index": idx,
+            "confidence": round(rng.uniform(0.5, 0.95), 2)
+        }
+        if enriched:
+            action.update(selector=elem["selector"], element_type=elem["tag"], bounds=elem["bounds"])
+        actions.append(action)
+    return json.dumps({
+        "page_analysis": {"page_type": "ecommerce", "page_summary": "Shopping site home page", "actions": actions},
+        "dom_elements": elements,
+        "image_filename": "screenshot.png"
+    })
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current, elapsed
+
+
+def expected(session: dict) -> dict:
+    """The session as the compact form gives it back (bounds at float32)"""
+    session = json.loads(json.dumps(session))
+    for elem in session["dom_elements"]:
+        elem["bounds"] = as_float32(elem["bounds"])
+    for action in session["page_analysis"]["actions"]:
+        if "bounds" in action:
+            action["bounds"] = as_float32(action["bounds"])
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--elements", type=int, default=50)
+    parser.add_argument("--actions", type=int, default=5)
+    parser.add_argument("--enriched", action="store_true", help="actions carry selector/element_type/bounds copies")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [make_page(rng, args.elements, args.actions, args.enriched) for _ in range(args.sessions)]
+    json_bytes = sum(len(p) for p in pages)
+
+    raw, raw_bytes, raw_s = measure(lambda: [json.loads(p) for p in pages])
+    # Parsing happens in both cases; only the compact form is kept
+    compact, compact_bytes, compact_s = measure(lambda: [CompactSession(json.loads(p)) for p in pages])
+
+    assert compact[0].expand() == expected(raw[0]), "round trip changed the session"
+    estimate = sum(c.nbytes() for c in compact)
+
+    start = time.perf_counter()
+    for c in compact[:1000]:
+        c.expand()
+    expand_us = (time.perf_counter() - start) / min(1000, len(compact)) * 1e6
+
+    n = args.sessions
+    print(f"{n} sessions x {args.elements} elements, {args.actions} {'enriched ' if args.enriched else ''}actions "
+          f"(JSON {json_bytes / n / 1024:.1f} KB/session)")
+    print(f"{'':10} {'total MB':>9} {'KB/session':>11} {'build s':>8}")
+    print(f"{'raw dicts':10} {raw_bytes / 2**20:9.1f} {raw_bytes / n / 1024:11.1f} {raw_s:8.2f}")
+    print(f"{'compact':10} {compact_bytes / 2**20:9.1f} {compact_bytes / n / 1024:11.1f} {compact_s:8.2f}")
+    print(f"saved {1 - compact_bytes / raw_bytes:.0%}; nbytes() estimate {estimate / n / 1024:.1f} KB/session; "
+          f"expand() {expand_us:.0f} µs/session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Stand-in for an Ollama server, for load/latency testing without a GPU.
+
+Run from the backend folder:
+    python benchmarks/fake_ollama.py [--port 11434] [--ttft 0.8] [--tokens-per-sec 40]
+        [--error-rate 0.0] [--malformed-rate 0.0] [--parallel 1] [--max-queue 512] [--seed 0]
+
+then point the API at it (OLLAMA_BASE_URL=http://localhost:11434).
+
+Implements /api/tags, /api/chat and /api/generate, streaming and non-streaming.
+Answers follow the request's "format" schema: a PageAnalysis built from the
+element lines in the prompt, a CommandInterpretation, or plain text.
+Like Ollama, only --parallel generations run at once (the rest queue, and
+requests beyond --max-queue get a 503), generation stops when the client
+disconnects, and responses carry the usual timing fields (nanoseconds).
+GET /fake/stats shows what the server has seen.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ELEMENT_LINE = re.compile(r"^\s*(\d+)\|([^|]*)\|([^|]*)\|", re.MULTILINE)
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class FakeConfig:
+    model: str = "qwen2.5vl:7b"
+    ttft: float = 0.8             # seconds until the first token (prompt eval)
+    tokens_per_sec: float = 40.0
+    load_time: float = 0.0        # extra delay on the first request, like a cold model load
+    error_rate: float = 0.0       # fraction of requests answered with HTTP 500
+    malformed_rate: float = 0.0   # fraction of answers cut off mid-JSON
+    parallel: int = 1             # OLLAMA_NUM_PARALLEL
+    max_queue: int = 512          # OLLAMA_MAX_QUEUE
+    seed: Optional[int] = None
+
+
+def analysis_answer(prompt: str) -> Dict[str, Any]:
+    """PageAnalysis for the first (highest ranked) elements listed in the prompt"""
+    actions = []
+    for n, match in enumerate(ELEMENT_LINE.finditer(prompt)):
+        if n == 3:
+            break
+        index, tag, text = match.groups()
+        label = text.strip() or f"Use {tag.split(':')[0]}"
+        actions.append({
+            "id": f"action_{n + 1}",
+            "label": label,
+            "description": f"{label} ({tag})",
+            "element_index": int(index),
+            "confidence": round(0.9 - 0.1 * n, 2)
+        })
+    return {"page_type": "generic", "page_summary": "Synthetic page", "actions": actions}
+
+
+def interpretation_answer(prompt: str) -> Dict[str, Any]:
+    ids = re.findall(r'"id":\s*"([^"]+)"', prompt)
+    return {
+        "selected_action_id": ids[0] if ids else None,
+        "confidence": 0.8 if ids else 0.0,
+        "clarification_needed": not ids,
+        "reasoning": "Fake model picked the first action"
+    }
+
+
+def answer_for(body: Dict[str, Any], prompt: str) -> str:
+    properties = (body.get("format") or {}).get("properties", {}) if isinstance(body.get("format"), dict) else {}
+    if "actions" in properties:
+        return json.dumps(analysis_answer(prompt))
+    if "selected_action_id" in properties:
+        return json.dumps(interpretation_answer(prompt))
+    if body.get("format") == "json":
+        return json.dumps({"response": "OK"})
+    return "OK"
+
+
+def split_tokens(text: str) -> List[str]:
+    return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)] or [""]
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    rng = random.Random(config.seed)
+    slots = asyncio.Semaphore(config.parallel)
+    stats = {"requests": 0, "completed": 0, "cancelled": 0, "errors": 0, "malformed": 0,
+             "rejected": 0, "active": 0, "queued": 0, "max_active": 0, "max_queued": 0}
+    loaded = {"model": False}
+
+    def prompt_of(body: Dict[str, Any]) -> str:
+        if "messages" in body:
+            return "\n".join(str(m.get("content", "")) for m in body["messages"])
+        return str(body.get("prompt", ""))
+
+    def plan(body: Dict[str, Any]) -> Dict[str, Any]:
+        """Decide this request's fate up front (one rng draw order per request, so runs are reproducible)"""
+        error = rng.random() < config.error_rate
+        malformed = rng.random() < config.malformed_rate
+        prompt = prompt_of(body)
+        text = answer_for(body, prompt)
+        if malformed:
+            text = text[:max(1, len(text) // 2)]
+        tokens = split_tokens(text)
+        num_predict = (body.get("options") or {}).get("num_predict")
+        if num_predict is not None and num_predict >= 0:
+            tokens = tokens[:max(1, num_predict)]
+        return {"error": error, "malformed": malformed, "tokens": tokens,
+                "prompt_tokens": len(prompt) // CHARS_PER_TOKEN + 256 * len(body.get("images") or [])
+                + sum(256 * len(m.get("images") or []) for m in body.get("messages", []))}
+
+    async def acquire() -> bool:
+        if stats["queued"] >= config.max_queue:
+            stats["rejected"] += 1
+            return False
+        stats["queued"] += 1
+        stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+        try:
+            await slots.acquire()
+        finally:
+            stats["queued"] -= 1
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        return True
+
+    def release():
+        stats["active"] -= 1
+        slots.release()
+
+    async def prompt_eval() -> float:
+        """Cold load (first request only) + time to first token; returns load seconds"""
+        load = 0.0
+        if not loaded["model"]:
+            loaded["model"] = True
+            load = config.load_time
+        await asyncio.sleep(load + config.ttft)
+        return load
+
+    def timings(started: float, load: float, prompt_tokens: int, eval_count: int) -> Dict[str, int]:
+        eval_duration = eval_count / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        return {
+            "total_duration": int((time.monotonic() - started) * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(config.ttft * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(eval_duration * 1e9)
+        }
+
+    def chunk(body: Dict[str, Any], chat: bool, text: str, done: bool) -> Dict[str, Any]:
+        out = {"model": body.get("model", config.model), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+               "done": done}
+        if chat:
+            out["message"] = {"role": "assistant", "content": text}
+        else:
+            out["response"] = text
+        if done:
+            out["done_reason"] = "stop"
+        return out
+
+    async def generate(request: Request, chat: bool):
+        body = await request.json()
+        stats["requests"] += 1
+        fate = plan(body)
+        if fate["error"]:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": "fake ollama: injected failure"})
+        if not await acquire():
+            return JSONResponse(status_code=503, content={"error": "server busy, please try again"})
+        if fate["malformed"]:
+            stats["malformed"] += 1
+        delay = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        started = time.monotonic()
+
+        if not body.get("stream", True):
+            try:
+                load = await prompt_eval()
+                for _ in fate["tokens"]:
+                    if await request.is_disconnected():
+                        stats["cancelled"] += 1
+                        return JSONResponse(status_code=499, content={"error": "client disconnected"})
+                    await asyncio.sleep(delay)
+            finally:
+                release()
+            stats["completed"] += 1
+            result = chunk(body, chat, "".join(fate["tokens"]), True)
+            result.update(timings(started, load, fate["prompt_tokens"], len(fate["tokens"])))
+            return result
+
+        async def stream():
+            finished = False
+            try:
+                load = await prompt_eval()
+                for token in fate["tokens"]:
+                    yield json.dumps(chunk(body, chat, token, False)) + "\n"
+                    await asyncio.sleep(delay)
+                final = chunk(body, chat, "", True)
+                final.update(timings(started, load, fate["prompt_tokens"], len(fate["tokens"])))
+                yield json.dumps(final) + "\n"
+                finished = True
+                stats["completed"] += 1
+            finally:
+                if not finished:
+                    stats["cancelled"] += 1
+                release()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": config.model, "model": config.model, "size": 0}]}
+
+    @app.post("/api/chat")
+    async def api_chat(request: Request):
+        return await generate(request, chat=True)
+
+    @app.post("/api/generate")
+    async def api_generate(request: Request):
+        return await generate(request, chat=False)
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="qwen2.5vl:7b")
+    parser.add_argument("--ttft", type=float, default=0.8, help="seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--load-time", type=float, default=0.0, help="cold model load on the first request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=1, help="generations at once (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--max-queue", type=int, default=512, help="waiting requests before 503 (OLLAMA_MAX_QUEUE)")
+    parser.add_argument("--seed", type=int, default=None, help="fix the error/malformed draws")
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        model=args.model, ttft=args.ttft, tokens_per_sec=args.tokens_per_sec, load_time=args.load_time,
+        error_rate=args.error_rate, malformed_rate=args.malformed_rate, parallel=args.parallel,
+        max_queue=args.max_queue, seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
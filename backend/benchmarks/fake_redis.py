@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Stand-in for a Redis server, for running the "redis" session backend locally.
+
+Run from the backend folder:
+    python benchmarks/fake_redis.py [--port 6379]
+
+then start the API with SESSION_BACKEND=redis SESSION_REDIS_URL=redis://localhost:6379/0
+(several uvicorn workers can share it).
+
+Speaks RESP2 and implements the commands the session store and the usual
+smoke tests need: PING, ECHO, AUTH, SELECT, GET, SET [EX|PX] [NX|XX],
+GETEX [EX|PX|PERSIST], DEL, EXISTS, EXPIRE, PEXPIRE, TTL, PTTL, DBSIZE, FLUSHDB.
+Keys expire lazily, like Redis; everything lives in memory.
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRedis:
+    def __init__(self):
+        self.dbs: Dict[int, Dict[bytes, Tuple[bytes, Optional[float]]]] = {}
+
+    def db(self, index: int) -> Dict[bytes, Tuple[bytes, Optional[float]]]:
+        return self.dbs.setdefault(index, {})
+
+    @staticmethod
+    def _alive(entry) -> bool:
+        return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def lookup(self, db, key: bytes):
+        entry = db.get(key)
+        if entry is not None and not self._alive(entry):
+            del db[key]
+            return None
+        return entry
+
+    @staticmethod
+    def expiry(option: bytes, amount: bytes) -> float:
+        seconds = int(amount) / 1000 if option.upper() == b"PX" else int(amount)
+        return time.monotonic() + seconds
+
+    def handle(self, state: dict, args: List[bytes]):
+        command = args[0].upper()
+        db = self.db(state["db"])
+
+        if command == b"PING":
+            return "+PONG" if len(args) == 1 else args[1]
+        if command == b"ECHO":
+            return args[1]
+        if command == b"AUTH":
+            return "+OK"
+        if command == b"SELECT":
+            state["db"] = int(args[1])
+            return "+OK"
+        if command == b"GET":
+            entry = self.lookup(db, args[1])
+            return entry[0] if entry else None
+        if command == b"SET":
+            key, value, expires = args[1], args[2], None
+            options = [a.upper() for a in args[3:]]
+            i = 0
+            while i < len(options):
+                if options[i] in (b"EX", b"PX"):
+                    expires = self.expiry(options[i], args[3 + i + 1])
+                    i += 2
+                    continue
+                if options[i] == b"NX" and self.lookup(db, key) is not None:
+                    return None
+                if options[i] == b"XX" and self.lookup(db, key) is None:
+                    return None
+                i += 1
+            db[key] = (value, expires)
+            return "+OK"
+        if command == b"GETEX":
+            entry = self.lookup(db, args[1])
+            if entry is None:
+                return None
+            if len(args) >= 3:
+                option = args[2].upper()
+                expires = None if option == b"PERSIST" else self.expiry(option, args[3])
+                db[args[1]] = (entry[0], expires)
+            return entry[0]
+        if command == b"DEL":
+            removed = 0
+            for key in args[1:]:
+                if self.lookup(db, key) is not None:
+                    del db[key]
+                    removed += 1
+            return removed
+        if command == b"EXISTS":
+            return sum(1 for key in args[1:] if self.lookup(db, key) is not None)
+        if command in (b"EXPIRE", b"PEXPIRE"):
+            entry = self.lookup(db, args[1])
+            if entry is None:
+                return 0
+            db[args[1]] = (entry[0], self.expiry(b"PX" if command == b"PEXPIRE" else b"EX", args[2]))
+            return 1
+        if command in (b"TTL", b"PTTL"):
+            entry = self.lookup(db, args[1])
+            if entry is None:
+                return -2
+            if entry[1] is None:
+                return -1
+            remaining = entry[1] - time.monotonic()
+            return int(remaining * 1000) if command == b"PTTL" else int(remaining)
+        if command == b"DBSIZE":
+            return sum(1 for entry in list(db.values()) if self._alive(entry))
+        if command == b"FLUSHDB":
+            db.clear()
+            return "+OK"
+        return Exception(f"ERR unknown command '{args[0].decode(errors='replace')}'")
+
+
+def encode_reply(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, str):
+        return reply.encode() + b"\r\n"  # simple string, already prefixed with +
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readuntil(b"\r\n")
+    if not line.startswith(b"*"):
+        return line.strip().split()  # inline command (e.g. typed into telnet)
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readuntil(b"\r\n")
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def serve(server: FakeRedis):
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        state = {"db": 0}
+        try:
+            while True:
+                args = await read_command(reader)
+                if not args:
+                    continue
+                try:
+                    reply = server.handle(state, args)
+                except (IndexError, ValueError):
+                    reply = Exception("ERR syntax error")
+                writer.write(encode_reply(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return client
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = await asyncio.start_server(serve(FakeRedis()), args.host, args.port)
+    print(f"Fake Redis listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
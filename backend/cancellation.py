@@ -0,0 +1,71 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict
+
+import httpx
+from starlette.requests import Request
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before its analysis finished"""
+
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable, poll_interval: float = 0.25) -> Any:
+    """
+    Await `awaitable` as a task, cancelling it as soon as the client disconnects.
+    Cancellation propagates down to the Ollama HTTP call, which closes the
+    connection so Ollama stops generating.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        # Our own caller was cancelled (server shutdown etc.): don't leak the task
+        if not task.done():
+            task.cancel()
+
+
+class GenerationStats:
+    """How Ollama generations ended, to see how much GPU time cancellation reclaims"""
+
+    def __init__(self):
+        self.completed = 0
+        self.cancelled = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.cancelled_seconds = 0.0  # time generations had run before being cancelled
+
+    @asynccontextmanager
+    async def track(self):
+        started = time.monotonic()
+        try:
+            yield
+            self.completed += 1
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            self.cancelled_seconds += time.monotonic() - started
+            raise
+        except (TimeoutError, httpx.TimeoutException):
+            self.timed_out += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.cancelled
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "cancelled_ratio": round(self.cancelled / finished, 4) if finished else 0.0,
+            "cancelled_seconds": round(self.cancelled_seconds, 3)
+        }
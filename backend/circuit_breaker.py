@@ -0,0 +1,123 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple, Type
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a backend that is known to be down"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open, next trial in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through; failure_threshold consecutive failures open it.
+    Open: calls fail immediately with CircuitOpen for reset_timeout seconds.
+    Half-open: up to half_open_trials calls are let through as trial probes;
+    success_threshold successes close it again, any failure re-opens it.
+    Exceptions in `excluded` (e.g. our own overload rejections) say nothing
+    about the backend and are not counted.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0,
+                 half_open_trials: int = 1, success_threshold: int = 1,
+                 excluded: Tuple[Type[BaseException], ...] = ()):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_trials = half_open_trials
+        self.success_threshold = success_threshold
+        self.excluded = excluded
+
+        self._state = CLOSED
+        self._failures = 0        # consecutive, while closed
+        self._successes = 0       # while half-open
+        self._trials = 0          # trial calls in flight while half-open
+        self._opened_at = 0.0
+        self.opened = 0
+        self.short_circuited = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._successes = 0
+            self._trials = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go to the backend now"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._trials >= self.half_open_trials):
+            self.short_circuited += 1
+            raise CircuitOpen(self.retry_after() if state == OPEN else self.reset_timeout)
+        if state == HALF_OPEN:
+            self._trials += 1
+
+    def record_success(self):
+        if self._state == HALF_OPEN:
+            self._trials = max(0, self._trials - 1)
+            self._successes += 1
+            if self._successes >= self.success_threshold:
+                self._state = CLOSED
+        self._failures = 0
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        if error is not None:
+            self.last_error = f"{type(error).__name__}: {error}"
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._failures += 1
+        if self._state == CLOSED and self._failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._failures = 0
+        self._trials = 0
+        self.opened += 1
+
+    def _release_trial(self):
+        if self._state == HALF_OPEN:
+            self._trials = max(0, self._trials - 1)
+
+    @asynccontextmanager
+    async def guard(self):
+        """Wrap one backend call: raises CircuitOpen up front, records the outcome"""
+        self.before_call()
+        try:
+            yield
+        except self.excluded:
+            self._release_trial()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        except BaseException:
+            # Cancelled (client went away): no verdict on the backend
+            self._release_trial()
+            raise
+        self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_after_s": round(self.retry_after(), 3) if state == OPEN else None,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+            "last_error": self.last_error
+        }
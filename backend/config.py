@@ -4,13 +4,72 @@ from typing import Optional
 class Settings(BaseSettings):
     # Ollama Configuration
     OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_BASE_URLS: list = []  # Several Ollama servers, e.g. '["http://gpu1:11434","http://gpu2:11434"]' (overrides OLLAMA_BASE_URL)
+    OLLAMA_PROBE_INTERVAL: float = 10.0  # Seconds between /api/tags health probes
+    OLLAMA_EJECT_AFTER_FAILURES: int = 3  # Consecutive failures before a backend stops getting traffic
     OLLAMA_MODEL: str = "qwen2.5vl:7b"  # Updated to vision model!
+    OLLAMA_KEEP_ALIVE: str = "30m"  # How long Ollama keeps the model loaded after a request
+    OLLAMA_WARMUP_ENABLED: bool = True  # Load the model at startup; /ready stays 503 until done
+    OLLAMA_WARMUP_TIMEOUT: float = 120.0  # Model load can take much longer than a normal request
+    OLLAMA_WARMUP_REFRESH: float = 600.0  # Re-send the warmup prompt this often
+    OLLAMA_MAX_CONCURRENCY: int = 2  # Generations allowed to run at once
+    OLLAMA_MAX_QUEUE: int = 16  # Requests allowed to wait for a slot (0 = never queue)
+    OLLAMA_INITIAL_SERVICE_TIME: float = 8.0  # Generation time assumed until real ones are measured
+    OLLAMA_REQUEST_DEADLINE: float = 30.0  # Seconds a request may take end to end
+    OLLAMA_OVERLOAD_POLICY: str = "fallback"  # "fallback" (heuristic analysis) or "reject" (429 + Retry-After)
+    
+    # Ollama HTTP client (one shared connection pool)
+    OLLAMA_POOL_MAX_CONNECTIONS: int = 20
+    OLLAMA_POOL_MAX_KEEPALIVE: int = 10  # Idle connections kept open for reuse
+    OLLAMA_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection stays open
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0  # A dead backend fails fast instead of waiting out the read timeout
+    OLLAMA_READ_TIMEOUT: float = 30.0
+    OLLAMA_WRITE_TIMEOUT: float = 30.0
+    OLLAMA_POOL_TIMEOUT: float = 5.0  # Wait for a free connection when all are in use
+    
+    # Circuit breaker (fail fast to the fallback while Ollama is down)
+    OLLAMA_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open the circuit
+    OLLAMA_CIRCUIT_RESET_TIMEOUT: float = 15.0  # Seconds open before trial requests are let through
+    OLLAMA_CIRCUIT_HALF_OPEN_TRIALS: int = 1  # Concurrent trial requests while half-open
+    OLLAMA_CIRCUIT_SUCCESS_THRESHOLD: int = 1  # Successful trials needed to close it again
     
     # FasterWhisper Configuration
     WHISPER_MODEL: str = "base"
     WHISPER_DEVICE: str = "cpu"  # Change to "cuda" if you have NVIDIA GPU
     WHISPER_COMPUTE_TYPE: str = "float32"
     
+    # Image Preprocessing
+    IMAGE_EXECUTOR_MODE: str = "thread"  # "thread", "process" or "inline"
+    IMAGE_EXECUTOR_WORKERS: int = 4  # 0 = min(4, CPU count)
+    IMAGE_PASSTHROUGH_MAX_BYTES: int = 1_000_000  # RGB JPEGs under this (and max_size) skip re-encoding
+    VISION_TOKEN_BUDGET: int = 1024  # Max vision tokens per screenshot for patch-grid models (see image_pipeline.VISION_GRIDS)
+    
+    # Prompt Building
+    PROMPT_DOM_TOKEN_BUDGET: int = 400  # Approx. tokens of DOM element listing per prompt
+    PROMPT_DOM_TOP_K: int = 20  # Best-ranked elements considered for the prompt (see dom_ranking)
+    
+    # DOM Payload (dom_elements form field, JSON or msgpack)
+    DOM_MAX_BYTES: int = 1024 * 1024  # Starlette caps plain (non-file) form fields at 1 MB anyway
+    DOM_MAX_ELEMENTS: int = 2000
+    
+    # Screenshot Cache (skips Ollama for repeat pages)
+    SCREENSHOT_CACHE_ENABLED: bool = True
+    SCREENSHOT_CACHE_MAX_ENTRIES: int = 256
+    SCREENSHOT_CACHE_TTL_SECONDS: float = 600.0
+    SCREENSHOT_CACHE_MAX_DISTANCE: int = 4  # Max Hamming distance between 64-bit hashes
+    
+    # Session Store (analyses kept for /api/interpret-command)
+    SESSION_MAX_ENTRIES: int = 1000
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024  # Estimated memory for all sessions together
+    SESSION_IDLE_TTL: float = 1800.0  # Seconds without use before a session expires
+    SESSION_BACKEND: str = "memory"  # "memory" (one process), "sqlite" (workers on one host), "redis" (many hosts) or "none"
+    SESSION_SQLITE_PATH: str = "sessions.db"
+    SESSION_REDIS_URL: str = "redis://localhost:6379/0"
+    # Signed session tokens (stateless mode): set the same secret on every replica.
+    # Empty disables them; with SESSION_BACKEND=none they are the only sessions
+    SESSION_TOKEN_SECRET: str = ""
+    SESSION_TOKEN_TTL: float = 1800.0
+    
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
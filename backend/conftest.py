@@ -0,0 +1,63 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import httpx
+import pytest
+
+FAKE_OLLAMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fake_ollama.py")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_ollama(port: int, ttft: float, tokens_per_sec: float) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, FAKE_OLLAMA, "--port", str(port), "--ttft", str(ttft),
+         "--tokens-per-sec", str(tokens_per_sec)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/tags", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"fake_ollama did not start on port {port}")
+
+
+@pytest.fixture(scope="module")
+def fake_ollama():
+    """
+    Starts benchmarks/fake_ollama.py servers: fake_ollama(port=None, ttft=0.05,
+    tokens_per_sec=2000) returns the base URL. All are stopped after the module.
+    """
+    processes = []
+
+    def start(port: Optional[int] = None, ttft: float = 0.05, tokens_per_sec: float = 2000.0) -> str:
+        port = port or free_port()
+        processes.append(start_fake_ollama(port, ttft, tokens_per_sec))
+        return f"http://127.0.0.1:{port}"
+
+    yield start
+    for process in processes:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@pytest.fixture
+def dead_port() -> int:
+    """A port nothing listens on (until a test starts a server there)"""
+    return free_port()
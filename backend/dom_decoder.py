@@ -0,0 +1,88 @@
+from typing import Annotated, Any, Dict, List, Optional, Union
+
+import msgspec
+
+JSON_TYPES = ("application/json", "text/plain", "application/octet-stream", "")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class Bounds(msgspec.Struct, omit_defaults=True):
+    x: Optional[float] = None
+    y: Optional[float] = None
+    width: Optional[float] = None
+    height: Optional[float] = None
+
+
+class DomElement(msgspec.Struct, omit_defaults=True):
+    """One element as the extension captures it; unknown fields are dropped"""
+    index: Optional[int] = None
+    tag: Optional[str] = None
+    text: Optional[str] = None
+    type: Optional[str] = None
+    id: Optional[str] = None
+    placeholder: Optional[str] = None
+    role: Optional[str] = None
+    classes: Optional[List[str]] = None
+    selector: Optional[str] = None
+    bounds: Optional[Bounds] = None
+
+
+class DomPayloadError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class DomDecoder:
+    """
+    Decodes the dom_elements field (JSON, or msgpack when sent as a file part
+    with a msgpack content type) straight into DomElement structs, then into
+    the plain dicts the rest of the pipeline uses.
+    - max_bytes: checked before decoding (413)
+    - max_elements: checked by the decoder itself (422), as are field types
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024, max_elements: int = 2000):
+        self.max_bytes = max_bytes
+        self.max_elements = max_elements
+        elements_type = Annotated[List[DomElement], msgspec.Meta(max_length=max_elements)]
+        self._json = msgspec.json.Decoder(elements_type)
+        self._msgpack = msgspec.msgpack.Decoder(elements_type)
+        self.decoded = {"json": 0, "msgpack": 0}
+        self.rejected = 0
+
+    def decode(self, data: Union[str, bytes], content_type: str = "application/json") -> List[Dict[str, Any]]:
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        if media_type in MSGPACK_TYPES:
+            decoder, kind = self._msgpack, "msgpack"
+        elif media_type in JSON_TYPES:
+            decoder, kind = self._json, "json"
+        else:
+            self.rejected += 1
+            raise DomPayloadError(415, f"Unsupported dom_elements content type: {media_type}")
+
+        if isinstance(data, str):
+            data = data.encode()
+        if len(data) > self.max_bytes:
+            self.rejected += 1
+            raise DomPayloadError(413, f"dom_elements is larger than {self.max_bytes} bytes")
+
+        try:
+            elements = decoder.decode(data)
+        except msgspec.ValidationError as e:
+            self.rejected += 1
+            raise DomPayloadError(422, f"Invalid dom_elements: {e}")
+        except msgspec.DecodeError as e:
+            self.rejected += 1
+            raise DomPayloadError(400, f"Malformed dom_elements ({kind}): {e}")
+
+        self.decoded[kind] += 1
+        return msgspec.to_builtins(elements)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_bytes": self.max_bytes,
+            "max_elements": self.max_elements,
+            "decoded": dict(self.decoded),
+            "rejected": self.rejected
+        }
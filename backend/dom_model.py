@@ -0,0 +1,338 @@
+"""
+Compact in-memory forms of a session's DOM elements and analysis.
+
+json.loads gives every element its own dict, a dict for its bounds, a list of
+class names and fresh copies of strings such as "button" or "btn-primary".
+ElementTable stores the same data column-wise instead: one list per field,
+bounds packed into a single float32 array, tags/types/class names interned
+and identical class lists shared. Analyses keep their actions as __slots__
+objects; if an action carries selector/element_type/bounds copied from its
+element (as ai_processor's _enrich_with_element_data adds), those are read
+back from the table instead of being stored twice. The API's own analyses
+are not enriched, so in practice the savings come from the table.
+"""
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+BOUNDS_FIELDS = ("x", "y", "width", "height")
+NAN = float("nan")
+MISSING = -1  # in the index column
+
+# Columns kept as one list each; anything else an element carries goes to extras
+STRING_FIELDS = ("tag", "type", "text", "id", "placeholder", "selector")
+INTERNED_FIELDS = ("tag", "type")
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def estimate_size(obj: Any) -> int:
+    """Rough deep size in bytes of JSON-like data (dicts/lists/strings/numbers)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += estimate_size(item)
+    return size
+
+
+def _is_number(value) -> bool:
+    return type(value) in (int, float)
+
+
+def _packable_bounds(box) -> bool:
+    return isinstance(box, dict) and bool(box) and all(key in BOUNDS_FIELDS and _is_number(value) and value == value for key, value in box.items())
+
+
+def _packable_classes(names) -> bool:
+    return isinstance(names, list) and all(type(name) is str for name in names)
+
+
+def _in_column(key: str, value) -> bool:
+    """Whether the table's columns can hold this field without changing it"""
+    if key in STRING_FIELDS:
+        return value is not None
+    if key == "classes":
+        return _packable_classes(value)
+    if key == "bounds":
+        return _packable_bounds(value)
+    if key == "index":
+        return type(value) is int
+    return False
+
+
+def as_float32(box: Dict[str, Any]) -> Dict[str, float]:
+    """Bounds as the table stores them"""
+    return dict(zip(box, array("f", box.values())))
+
+
+class ElementTable:
+    """
+    Struct-of-arrays for a page's DOM elements. element(i) / to_dicts() give
+    back the original dicts (missing fields stay missing; bounds at float32
+    precision, i.e. well under a pixel).
+    """
+    __slots__ = ("columns", "classes", "bounds", "indexes", "extras", "_length")
+
+    def __init__(self, columns: Dict[str, list], classes: list, bounds: array,
+                 indexes: array, extras: Dict[int, Dict[str, Any]]):
+        self.columns = columns  # field -> values (None = field absent)
+        self.classes = classes  # tuples of interned names, or None
+        self.bounds = bounds  # x, y, width, height per element; NaN = absent
+        self.indexes = indexes  # the extension's own "index" field, MISSING if absent
+        self.extras = extras  # element -> fields without a column
+        self._length = len(indexes)
+
+    @classmethod
+    def from_dicts(cls, elements: Iterable[Dict[str, Any]]) -> "ElementTable":
+        columns = {field: [] for field in STRING_FIELDS}
+        classes, shared_classes = [], {}
+        bounds, indexes, extras = array("f"), array("q"), {}
+
+        for i, elem in enumerate(elements):
+            for field in STRING_FIELDS:
+                value = elem.get(field)
+                columns[field].append(_intern(value) if field in INTERNED_FIELDS else value)
+
+            names = elem.get("classes")
+            if _packable_classes(names):
+                names = tuple(sys.intern(name) for name in names)
+                classes.append(shared_classes.setdefault(names, names))
+            else:
+                classes.append(None)
+
+            box = elem.get("bounds")
+            if _packable_bounds(box):
+                bounds.extend(float(box.get(field, NAN)) for field in BOUNDS_FIELDS)
+            else:
+                bounds.extend((NAN, NAN, NAN, NAN))
+
+            index = elem.get("index")
+            indexes.append(index if type(index) is int else MISSING)
+
+            rest = {key: value for key, value in elem.items() if not _in_column(key, value)}
+            if rest:
+                extras[i] = rest
+
+        return cls(columns, classes, bounds, indexes, extras)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def tag(self, i: int) -> str:
+        return self.columns["tag"][i] or ""
+
+    def selector(self, i: int) -> str:
+        return self.columns["selector"][i] or ""
+
+    def has_bounds(self, i: int) -> bool:
+        return any(value == value for value in self.bounds[4 * i:4 * i + 4])
+
+    def element_bounds(self, i: int) -> Dict[str, float]:
+        box = self.bounds[4 * i:4 * i + 4]
+        return {field: value for field, value in zip(BOUNDS_FIELDS, box) if value == value}
+
+    def element(self, i: int) -> Dict[str, Any]:
+        elem = {}
+        if self.indexes[i] != MISSING:
+            elem["index"] = self.indexes[i]
+        for field in STRING_FIELDS:
+            value = self.columns[field][i]
+            if value is not None:
+                elem[field] = value
+        if self.classes[i] is not None:
+            elem["classes"] = list(self.classes[i])
+        if self.has_bounds(i):
+            elem["bounds"] = self.element_bounds(i)
+        extra = self.extras.get(i)
+        if extra:
+            elem.update(extra)
+        return elem
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self.element(i) for i in range(self._length)]
+
+    def nbytes(self) -> int:
+        """Estimated memory, counting each shared string / class list once"""
+        size = sys.getsizeof(self.columns) + self.bounds.buffer_info()[1] * self.bounds.itemsize
+        size += sys.getsizeof(self.indexes) + estimate_size(self.extras)
+        seen = set()
+        for values in list(self.columns.values()) + [self.classes]:
+            size += sys.getsizeof(values)
+            for value in values:
+                if value is not None and id(value) not in seen:
+                    seen.add(id(value))
+                    size += estimate_size(value)
+        return size
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Plain lists/bytes for msgpack (shared session backends)"""
+        return {
+            "columns": self.columns,
+            "classes": [list(names) if names is not None else None for names in self.classes],
+            "bounds": self.bounds.tobytes(),
+            "indexes": self.indexes.tobytes(),
+            "extras": {str(i): extra for i, extra in self.extras.items()}
+        }
+
+    @classmethod
+    def from_columns(cls, data: Dict[str, Any]) -> "ElementTable":
+        columns = data["columns"]
+        for field in INTERNED_FIELDS:
+            columns[field] = [_intern(value) for value in columns[field]]
+        classes, shared_classes = [], {}
+        for names in data["classes"]:
+            if names is not None:
+                names = tuple(_intern(name) for name in names)
+                names = shared_classes.setdefault(names, names)
+            classes.append(names)
+        bounds, indexes = array("f"), array("q")
+        bounds.frombytes(data["bounds"])
+        indexes.frombytes(data["indexes"])
+        extras = {int(i): extra for i, extra in data["extras"].items()}
+        return cls(columns, classes, bounds, indexes, extras)
+
+
+# Keys the model's answer (or the fallback) puts on an action
+ACTION_FIELDS = ("id", "label", "description", "element_index", "confidence", "reasoning")
+# Keys _enrich_with_element_data copies from the element
+ENRICHED_FIELDS = ("selector", "element_type", "bounds")
+
+
+class CompactAction:
+    """
+    One suggested action. When its selector/element_type/bounds were copied
+    from the element it points at, only a flag is kept and to_dict() copies
+    them again from the table.
+    """
+    __slots__ = ACTION_FIELDS + ("enriched", "extras")
+
+    def __init__(self, action: Dict[str, Any], table: Optional[ElementTable]):
+        for field in ACTION_FIELDS:
+            setattr(self, field, action.get(field, _ABSENT))
+        self.id = _intern(self.id)
+        extras = {key: value for key, value in action.items()
+                  if key not in ACTION_FIELDS and key not in ENRICHED_FIELDS}
+
+        idx = action.get("element_index")
+        self.enriched = (
+            table is not None and type(idx) is int and 0 <= idx < len(table)
+            and action.get("selector", _ABSENT) == table.selector(idx)
+            and action.get("element_type", _ABSENT) == table.tag(idx)
+            and _bounds_match(action.get("bounds"), table, idx)
+        )
+        if not self.enriched:
+            extras.update({key: action[key] for key in ENRICHED_FIELDS if key in action})
+        self.extras = extras or None
+
+    def to_dict(self, table: Optional[ElementTable]) -> Dict[str, Any]:
+        action = {field: getattr(self, field) for field in ACTION_FIELDS
+                  if getattr(self, field) is not _ABSENT}
+        if self.enriched:
+            idx = self.element_index
+            action["selector"] = table.selector(idx)
+            action["element_type"] = table.tag(idx)
+            action["bounds"] = table.element_bounds(idx)
+        if self.extras:
+            action.update(self.extras)
+        return action
+
+    def to_columns(self) -> list:
+        fields = {field: getattr(self, field) for field in ACTION_FIELDS if getattr(self, field) is not _ABSENT}
+        return [fields, self.enriched, self.extras]
+
+    @classmethod
+    def from_columns(cls, data: list) -> "CompactAction":
+        action = cls.__new__(cls)
+        fields, action.enriched, action.extras = data
+        for field in ACTION_FIELDS:
+            setattr(action, field, fields.get(field, _ABSENT))
+        action.id = _intern(action.id)
+        return action
+
+
+def _bounds_match(box, table: ElementTable, idx: int) -> bool:
+    if not isinstance(box, dict):
+        return False
+    if not box:
+        return not table.has_bounds(idx)
+    return _packable_bounds(box) and as_float32(box) == table.element_bounds(idx)
+
+
+class _Absent:
+    """Field not present (distinct from an explicit None)"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<absent>"
+
+
+_ABSENT = _Absent()
+
+
+class CompactSession:
+    """A session dict with dom_elements as an ElementTable and page_analysis actions as CompactActions"""
+    __slots__ = ("elements", "actions", "analysis", "rest")
+
+    def __init__(self, session: Dict[str, Any]):
+        elements = session.get("dom_elements")
+        self.elements = ElementTable.from_dicts(elements) if isinstance(elements, list) else None
+        analysis = session.get("page_analysis")
+        actions = analysis.get("actions") if isinstance(analysis, dict) else None
+        if isinstance(actions, list) and all(isinstance(a, dict) for a in actions):
+            self.actions = tuple(CompactAction(action, self.elements) for action in actions)
+            self.analysis = {key: value for key, value in analysis.items() if key != "actions"}
+        else:
+            self.actions = self.analysis = None
+        # Everything not converted above is kept as is
+        self.rest = {key: value for key, value in session.items()
+                     if not (key == "dom_elements" and self.elements is not None)
+                     and not (key == "page_analysis" and self.actions is not None)}
+
+    def expand(self) -> Dict[str, Any]:
+        """A fresh session dict (safe to mutate; put() it back to keep changes)"""
+        session = dict(self.rest)
+        if self.actions is not None:
+            session["page_analysis"] = {
+                **self.analysis,
+                "actions": [action.to_dict(self.elements) for action in self.actions]
+            }
+        if self.elements is not None:
+            session["dom_elements"] = self.elements.to_dicts()
+        return session
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Plain lists/dicts/bytes for msgpack (shared session backends)"""
+        return {
+            "compact": 1,
+            "elements": self.elements.to_columns() if self.elements is not None else None,
+            "actions": [action.to_columns() for action in self.actions] if self.actions is not None else None,
+            "analysis": self.analysis,
+            "rest": self.rest
+        }
+
+    @classmethod
+    def from_columns(cls, data: Dict[str, Any]) -> "CompactSession":
+        session = cls.__new__(cls)
+        elements = data["elements"]
+        session.elements = ElementTable.from_columns(elements) if elements is not None else None
+        actions = data["actions"]
+        session.actions = tuple(CompactAction.from_columns(a) for a in actions) if actions is not None else None
+        session.analysis = data["analysis"]
+        session.rest = data["rest"]
+        return session
+
+    def nbytes(self) -> int:
+        size = sys.getsizeof(self) + estimate_size(self.rest) + estimate_size(self.analysis)
+        if self.elements is not None:
+            size += self.elements.nbytes()
+        if self.actions is not None:
+            size += sys.getsizeof(self.actions)
+            for action in self.actions:
+                size += sys.getsizeof(action) + estimate_size(action.label) + estimate_size(action.description)
+                size += estimate_size(action.extras) if action.extras else 0
+        return size
@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# How useful each kind of element usually is as a suggested action
+TAG_WEIGHTS = {
+    "input": 1.0,
+    "button": 0.9,
+    "select": 0.8,
+    "textarea": 0.8,
+    "a": 0.5,
+}
+DEFAULT_TAG_WEIGHT = 0.4  # divs/spans with role=button, tabindex etc.
+TYPE_BONUS = {"search": 0.3, "submit": 0.15}
+
+# Feature weights for the final score
+W_AREA, W_POSITION, W_TAG, W_TEXT = 0.2, 0.3, 0.3, 0.2
+FOLD_PX = 800.0  # roughly one viewport; elements further down decay
+
+
+def _features(dom_elements: List[Dict]):
+    n = len(dom_elements)
+    area = np.zeros(n)
+    top = np.zeros(n)
+    tag_weight = np.full(n, DEFAULT_TAG_WEIGHT)
+    text_len = np.zeros(n)
+    texts = []
+
+    for i, elem in enumerate(dom_elements):
+        bounds = elem.get("bounds") or {}
+        area[i] = float(bounds.get("width") or 0) * float(bounds.get("height") or 0)
+        top[i] = float(bounds.get("y") or 0)
+        tag_weight[i] = TAG_WEIGHTS.get(elem.get("tag"), DEFAULT_TAG_WEIGHT) + TYPE_BONUS.get(elem.get("type"), 0.0)
+        text = " ".join(str(elem.get("text") or elem.get("placeholder") or "").lower().split())
+        text_len[i] = len(text)
+        texts.append(text)
+
+    return area, top, tag_weight, text_len, texts
+
+
+def score_elements(dom_elements: List[Dict]) -> np.ndarray:
+    """Heuristic usefulness score per element (higher = more likely a key action)"""
+    if not dom_elements:
+        return np.zeros(0)
+
+    area, top, tag_weight, text_len, texts = _features(dom_elements)
+
+    # Visible area on a log scale, so one hero banner doesn't dwarf everything
+    log_area = np.log1p(area)
+    area_score = log_area / log_area.max() if log_area.max() > 0 else log_area
+
+    # Above the fold scores highest, decaying further down the page
+    position_score = 1.0 / (1.0 + np.maximum(top, 0.0) / FOLD_PX)
+
+    # Short, real labels beat empty or paragraph-length text
+    text_score = np.where(text_len == 0, 0.3, np.where(text_len <= 40, 1.0, 0.6))
+
+    score = W_AREA * area_score + W_POSITION * position_score + W_TAG * tag_weight + W_TEXT * text_score
+
+    # Repeated labels ("Add to cart" x 20): keep the first, penalise the rest
+    _, first, inverse = np.unique(np.array(texts, dtype=object), return_index=True, return_inverse=True)
+    is_repeat = (first[inverse] != np.arange(len(texts))) & (text_len > 0)
+    score[is_repeat] *= 0.5
+
+    return score
+
+
+def rank_elements(dom_elements: List[Dict], top_k: Optional[int] = None) -> List[int]:
+    """Indices into dom_elements, best first (ties keep document order), cut to top_k"""
+    scores = score_elements(dom_elements)
+    order = np.argsort(-scores, kind="stable")
+    if top_k is not None:
+        order = order[:top_k]
+    return order.tolist()
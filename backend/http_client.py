@@ -0,0 +1,69 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+# httpx's own timeouts are a backstop: they fire this long after the request
+# deadline, so running out of time is reported by within_deadline, not as a backend error
+DEADLINE_GRACE = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's own deadline ran out: says nothing about the backend's health"""
+
+
+def create_ollama_client(max_connections: int = 20, max_keepalive: int = 10, keepalive_expiry: float = 30.0,
+                         connect_timeout: float = 5.0, read_timeout: float = 30.0, write_timeout: float = 30.0,
+                         pool_timeout: float = 5.0) -> httpx.AsyncClient:
+    """
+    The one HTTP client for talking to Ollama.
+    Connections are kept alive and reused across requests; a dead backend
+    fails fast on connect_timeout instead of waiting out read_timeout.
+    pool_timeout bounds the wait for a free connection when all are busy.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout
+        )
+    )
+
+
+def deadline_timeout(client: httpx.AsyncClient, remaining: float) -> httpx.Timeout:
+    """
+    Per-request timeout: the client's per-phase timeouts, capped by what is left
+    of the request deadline. A non-streaming generation sends nothing until it
+    is done, so the read timeout (OLLAMA_READ_TIMEOUT) bounds the whole generation.
+    """
+    timeout = client.timeout
+    cap = remaining + DEADLINE_GRACE
+    return httpx.Timeout(
+        connect=min(timeout.connect or cap, cap),
+        read=min(timeout.read or cap, cap),
+        write=min(timeout.write or cap, cap),
+        pool=min(timeout.pool or cap, cap)
+    )
+
+
+@asynccontextmanager
+async def within_deadline(remaining: float):
+    """
+    asyncio.timeout(remaining) that raises DeadlineExceeded when it fires, so the
+    pool and circuit breaker can tell a caller's deadline from a failing backend.
+    Don't hold it across a yield of an async generator (the timer would cancel the consumer).
+    """
+    scope = asyncio.timeout(remaining)
+    try:
+        async with scope:
+            yield
+    except TimeoutError:
+        if scope.expired():
+            raise DeadlineExceeded(f"Request deadline ({remaining:.1f}s left) exceeded") from None
+        raise
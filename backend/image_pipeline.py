@@ -0,0 +1,232 @@
+import asyncio
+import base64
+import io
+import math
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+from PIL import Image
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_PASSTHROUGH_MAX_BYTES = 1_000_000
+HASH_SIZE = 8
+DEFAULT_VISION_TOKEN_BUDGET = 1024
+
+
+@dataclass(frozen=True)
+class VisionGrid:
+    """
+    How a vision model cuts an image into tokens.
+    patch_size: pixels per side of one vision token (after any patch merging)
+    max_tokens: vision-token budget per screenshot
+    """
+    patch_size: int
+    max_tokens: int = DEFAULT_VISION_TOKEN_BUDGET
+
+    def tokens(self, width: int, height: int) -> int:
+        """Vision tokens for an image, rounding each side to the nearest patch like the model does"""
+        p = self.patch_size
+        return max(1, round(width / p)) * max(1, round(height / p))
+
+    def snap(self, width: float, height: float) -> tuple:
+        """Largest patch-aligned size not exceeding (width, height), at least one patch per side"""
+        p = self.patch_size
+        return (max(p, int(width) // p * p), max(p, int(height) // p * p))
+
+
+# Model family (OLLAMA_MODEL without the ":tag") -> patch grid.
+# Models not listed here keep the plain longest-side cap.
+VISION_GRIDS = {
+    "qwen2.5vl": 28,  # 14px ViT patches, 2x2 merged into one token
+    "qwen3-vl": 32,   # 16px patches, 2x2 merged
+}
+
+
+def grid_for_model(model: str, max_tokens: int = DEFAULT_VISION_TOKEN_BUDGET) -> Optional[VisionGrid]:
+    """Resize policy for an Ollama model name such as "qwen2.5vl:7b" (None = no grid)"""
+    patch_size = VISION_GRIDS.get(model.split(":")[0].lower())
+    if patch_size is None:
+        return None
+    return VisionGrid(patch_size=patch_size, max_tokens=max_tokens)
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """64-bit difference hash: survives re-encoding and small rendering changes"""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hash_image_bytes(contents: bytes) -> int:
+    """Perceptual hash of an encoded image (for callers that skip prepare_image)"""
+    image = Image.open(io.BytesIO(contents))
+    # JPEGs can be decoded at 1/8 scale, which is plenty for a 9x8 hash
+    image.draft('RGB', (64, 64))
+    return dhash(image)
+
+
+def target_size(size: tuple, max_size: int = DEFAULT_MAX_SIZE, grid: Optional[VisionGrid] = None) -> tuple:
+    """
+    Final (width, height): longest side capped at max_size and, when the model
+    has a patch grid, snapped down to whole patches within the token budget
+    """
+    width, height = size
+    ratio = min(1.0, max_size / max(size))
+
+    if grid is None:
+        if ratio == 1.0:
+            return size
+        return tuple(int(dim * ratio) for dim in size)
+
+    p = grid.patch_size
+    ratio = min(ratio, math.sqrt(grid.max_tokens * p * p / (width * height)))
+    return grid.snap(width * ratio, height * ratio)
+
+
+def decode_reduced(image: Image.Image, size: tuple) -> int:
+    """
+    Decode stage: ask libjpeg to DCT-scale a JPEG while decoding, to the smallest
+    1/2, 1/4 or 1/8 reduction that is still at least `size`.
+    Must run before the pixels are loaded. Returns the scale factor (1 = full decode).
+    """
+    if image.format != 'JPEG' or tuple(size) == image.size:
+        return 1
+
+    original_width = image.width
+    image.draft('RGB', size)
+    return max(1, round(original_width / image.width))
+
+
+def prepare_image(image: Image.Image, max_size: int = DEFAULT_MAX_SIZE, quality: int = 85,
+                  use_draft: bool = True, grid: Optional[VisionGrid] = None) -> dict:
+    """
+    Convert, resize and JPEG-encode a PIL image for Ollama.
+    "timings" has the seconds spent per stage (decode, resize, encode, base64, hash).
+    """
+    started = time.perf_counter()
+    new_size = target_size(image.size, max_size, grid)
+
+    # 1. Decode JPEGs at reduced scale so tall captures never exist at full size
+    decode_scale = decode_reduced(image, new_size) if use_draft else 1
+    image.load()
+    decoded = time.perf_counter()
+
+    # 2. Ensure RGB format (not RGBA, grayscale, etc.)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # 3. Resize the remainder (Ollama works better with smaller images)
+    if image.size != new_size:
+        image = image.resize(new_size, Image.Resampling.LANCZOS)
+    resized = time.perf_counter()
+
+    # 4. Convert to base64 for Ollama API
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=quality)
+    encoded = time.perf_counter()
+    img_str = base64.b64encode(buffered.getvalue()).decode()
+    b64_done = time.perf_counter()
+    phash = dhash(image)
+
+    return {
+        "image": img_str,
+        "width": image.width,
+        "height": image.height,
+        "format": "jpeg",
+        "phash": phash,
+        "path": "reencode",
+        "decode_scale": decode_scale,
+        "vision_tokens": grid.tokens(*image.size) if grid else None,
+        "timings": {
+            "decode": decoded - started,
+            "resize": resized - decoded,
+            "encode": encoded - resized,
+            "base64": b64_done - encoded,
+            "hash": time.perf_counter() - b64_done
+        }
+    }
+
+
+def is_llm_ready(image: Image.Image, size_bytes: int, max_size: int = DEFAULT_MAX_SIZE,
+                 max_bytes: int = DEFAULT_PASSTHROUGH_MAX_BYTES, grid: Optional[VisionGrid] = None) -> bool:
+    """Header-only check: can these bytes go to Ollama exactly as uploaded?"""
+    return (
+        image.format == 'JPEG'
+        and image.mode == 'RGB'
+        and max(image.size) <= max_size
+        and size_bytes <= max_bytes
+        and (grid is None or grid.tokens(*image.size) <= grid.max_tokens)
+    )
+
+
+def prepare_image_bytes(contents: bytes, max_size: int = DEFAULT_MAX_SIZE,
+                        passthrough_max_bytes: int = DEFAULT_PASSTHROUGH_MAX_BYTES,
+                        grid: Optional[VisionGrid] = None) -> dict:
+    """Decode raw upload bytes and prepare them for Ollama"""
+    # Image.open only parses the header; pixels are decoded on first access
+    image = Image.open(io.BytesIO(contents))
+
+    # Fast path: the extension already sends small RGB JPEGs, so skip the
+    # decode → re-encode round trip (and the extra quality loss)
+    if is_llm_ready(image, len(contents), max_size, passthrough_max_bytes, grid):
+        started = time.perf_counter()
+        width, height = image.size
+        img_str = base64.b64encode(contents).decode()
+        b64_done = time.perf_counter()
+        image.draft('RGB', (64, 64))  # 1/8-scale DCT decode is enough for the hash
+        return {
+            "image": img_str,
+            "width": width,
+            "height": height,
+            "format": "jpeg",
+            "phash": dhash(image),
+            "path": "passthrough",
+            "decode_scale": 1,
+            "vision_tokens": grid.tokens(width, height) if grid else None,
+            "timings": {"base64": b64_done - started, "hash": time.perf_counter() - b64_done}
+        }
+
+    return prepare_image(image, max_size, grid=grid)
+
+
+class ImageExecutor:
+    """
+    Runs CPU-bound image work away from the event loop.
+    mode: "thread" (default), "process" or "inline" (no pool, runs on the loop)
+    """
+
+    MODES = ("thread", "process", "inline")
+
+    def __init__(self, mode: str = "thread", max_workers: int = 0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown image executor mode: {mode}")
+
+        self.mode = mode
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._pool: Executor | None = None
+
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image")
+        elif mode == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the pool and await the result"""
+        if self._pool is None:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,14 +1,37 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 import uvicorn
 import json
 import base64
+import binascii
 import asyncio
 import httpx
+from contextlib import asynccontextmanager
 import uuid
-from typing import Optional
+import math
+import time
+from typing import Optional, Union
 from PIL import Image
 import io
+from image_pipeline import ImageExecutor, prepare_image_bytes, hash_image_bytes, grid_for_model
+from screenshot_cache import ScreenshotCache, dom_fingerprint
+from stream_parser import ActionStreamParser
+from singleflight import SingleFlight, content_key
+from ollama_scheduler import OllamaScheduler, SchedulerOverloaded
+from ollama_pool import OllamaPool
+from model_warmup import ModelWarmer
+from analysis_schema import ANALYSIS_SCHEMA, Action, PageAnalysis, SchemaParser
+from pydantic import ValidationError
+from prompt_builder import serialize_dom_for_prompt
+from dom_ranking import rank_elements
+from dom_decoder import DomDecoder, DomPayloadError
+from cancellation import ClientDisconnected, GenerationStats, run_until_disconnected
+from http_client import DEADLINE_GRACE, DeadlineExceeded, create_ollama_client, deadline_timeout, within_deadline
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from metrics import REGISTRY, SESSION_EVICTIONS, MetricsMiddleware, observe_stages, record_ollama_timings, timed
+from session_store import create_session_store
+from session_token import ExpiredSessionToken, InvalidSessionToken, SessionTokens
 
 # Import settings
 try:
@@ -17,14 +40,86 @@ except ImportError:
     # Default settings
     class Settings:
         OLLAMA_BASE_URL = "http://localhost:11434"
+        OLLAMA_BASE_URLS = []
+        OLLAMA_PROBE_INTERVAL = 10.0
+        OLLAMA_EJECT_AFTER_FAILURES = 3
+        OLLAMA_KEEP_ALIVE = "30m"
+        OLLAMA_WARMUP_ENABLED = True
+        OLLAMA_WARMUP_TIMEOUT = 120.0
+        OLLAMA_WARMUP_REFRESH = 600.0
         OLLAMA_MODEL = "qwen2.5vl:7b"
         HOST = "0.0.0.0"
         PORT = 8000
         CORS_ORIGINS = ["*"]
+        IMAGE_EXECUTOR_MODE = "thread"
+        IMAGE_EXECUTOR_WORKERS = 4
+        IMAGE_PASSTHROUGH_MAX_BYTES = 1_000_000
+        VISION_TOKEN_BUDGET = 1024
+        PROMPT_DOM_TOKEN_BUDGET = 400
+        PROMPT_DOM_TOP_K = 20
+        DOM_MAX_BYTES = 1024 * 1024
+        DOM_MAX_ELEMENTS = 2000
+        OLLAMA_MAX_CONCURRENCY = 2
+        OLLAMA_MAX_QUEUE = 16
+        OLLAMA_INITIAL_SERVICE_TIME = 8.0
+        OLLAMA_REQUEST_DEADLINE = 30.0
+        OLLAMA_OVERLOAD_POLICY = "fallback"
+        OLLAMA_POOL_MAX_CONNECTIONS = 20
+        OLLAMA_POOL_MAX_KEEPALIVE = 10
+        OLLAMA_KEEPALIVE_EXPIRY = 30.0
+        OLLAMA_CONNECT_TIMEOUT = 5.0
+        OLLAMA_READ_TIMEOUT = 30.0
+        OLLAMA_WRITE_TIMEOUT = 30.0
+        OLLAMA_POOL_TIMEOUT = 5.0
+        OLLAMA_CIRCUIT_FAILURE_THRESHOLD = 5
+        OLLAMA_CIRCUIT_RESET_TIMEOUT = 15.0
+        OLLAMA_CIRCUIT_HALF_OPEN_TRIALS = 1
+        OLLAMA_CIRCUIT_SUCCESS_THRESHOLD = 1
+        SCREENSHOT_CACHE_ENABLED = True
+        SCREENSHOT_CACHE_MAX_ENTRIES = 256
+        SCREENSHOT_CACHE_TTL_SECONDS = 600.0
+        SCREENSHOT_CACHE_MAX_DISTANCE = 4
+        SESSION_MAX_ENTRIES = 1000
+        SESSION_MAX_BYTES = 64 * 1024 * 1024
+        SESSION_IDLE_TTL = 1800.0
+        SESSION_BACKEND = "memory"
+        SESSION_SQLITE_PATH = "sessions.db"
+        SESSION_REDIS_URL = "redis://localhost:6379/0"
+        SESSION_TOKEN_SECRET = ""
+        SESSION_TOKEN_TTL = 1800.0
     
     settings = Settings()
 
-app = FastAPI(title="A11y Overlay API", version="1.0.0")
+def create_client() -> httpx.AsyncClient:
+    return create_ollama_client(
+        max_connections=settings.OLLAMA_POOL_MAX_CONNECTIONS,
+        max_keepalive=settings.OLLAMA_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY,
+        connect_timeout=settings.OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=settings.OLLAMA_READ_TIMEOUT,
+        write_timeout=settings.OLLAMA_WRITE_TIMEOUT,
+        pool_timeout=settings.OLLAMA_POOL_TIMEOUT
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client
+    # One pooled Ollama client for the whole app (probes, warmup, analysis)
+    client = create_client()
+    app.state.ollama_client = client
+    # Background /api/tags probes for every Ollama backend
+    ollama_pool.start(client)
+    # Load the model everywhere before real traffic arrives (see /ready)
+    if settings.OLLAMA_WARMUP_ENABLED:
+        model_warmer.start(client, [backend.url for backend in ollama_pool.backends])
+    yield
+    await model_warmer.stop()
+    await ollama_pool.stop()
+    await client.aclose()
+    await sessions.close()
+    image_executor.shutdown()
+
+app = FastAPI(title="A11y Overlay API", version="1.0.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -34,47 +129,119 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-endpoint request counts + latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
 
-sessions = {}
-client = httpx.AsyncClient(timeout=30.0)
+# Bounded: idle sessions expire, least recently used go first when full.
+# sqlite/redis backends let several workers (or hosts) share sessions
+sessions = create_session_store(
+    settings.SESSION_BACKEND,
+    max_entries=settings.SESSION_MAX_ENTRIES,
+    max_bytes=settings.SESSION_MAX_BYTES,
+    idle_ttl=settings.SESSION_IDLE_TTL,
+    sqlite_path=settings.SESSION_SQLITE_PATH,
+    redis_url=settings.SESSION_REDIS_URL
+)
+sessions.on_evict = SESSION_EVICTIONS.inc
+# Stateless alternative: the client carries the session as a signed token
+session_tokens = (SessionTokens(settings.SESSION_TOKEN_SECRET, ttl=settings.SESSION_TOKEN_TTL)
+                  if settings.SESSION_TOKEN_SECRET else None)
+client: Optional[httpx.AsyncClient] = None  # Created/closed in lifespan
+image_executor = ImageExecutor(
+    mode=settings.IMAGE_EXECUTOR_MODE,
+    max_workers=settings.IMAGE_EXECUTOR_WORKERS
+)
+# One or more Ollama servers, least-outstanding-requests routing + health probes
+ollama_pool = OllamaPool(
+    settings.OLLAMA_BASE_URLS or [settings.OLLAMA_BASE_URL],
+    eject_after=settings.OLLAMA_EJECT_AFTER_FAILURES,
+    probe_interval=settings.OLLAMA_PROBE_INTERVAL,
+    cooldown=settings.OLLAMA_PROBE_INTERVAL,
+    excluded=(DeadlineExceeded,)  # One caller's short deadline doesn't eject a healthy backend
+)
+# Validates model output against PageAnalysis and counts schema failures
+analysis_parser = SchemaParser(PageAnalysis)
+# Typed, size/count-limited decoding of the dom_elements field
+dom_decoder = DomDecoder(max_bytes=settings.DOM_MAX_BYTES, max_elements=settings.DOM_MAX_ELEMENTS)
+# Warms the model on startup and keeps it resident (keep_alive)
+model_warmer = ModelWarmer(
+    settings.OLLAMA_MODEL,
+    keep_alive=settings.OLLAMA_KEEP_ALIVE,
+    timeout=settings.OLLAMA_WARMUP_TIMEOUT,
+    refresh_interval=settings.OLLAMA_WARMUP_REFRESH
+)
+# Bounded concurrency + queue in front of Ollama (fast 429 / fallback when overloaded)
+ollama_scheduler = OllamaScheduler(
+    max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+    max_queue=settings.OLLAMA_MAX_QUEUE,
+    default_deadline=settings.OLLAMA_REQUEST_DEADLINE,
+    initial_service_time=settings.OLLAMA_INITIAL_SERVICE_TIME
+)
+# Skips Ollama entirely while it is down (straight to the fallback analysis)
+ollama_breaker = CircuitBreaker(
+    failure_threshold=settings.OLLAMA_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.OLLAMA_CIRCUIT_RESET_TIMEOUT,
+    half_open_trials=settings.OLLAMA_CIRCUIT_HALF_OPEN_TRIALS,
+    success_threshold=settings.OLLAMA_CIRCUIT_SUCCESS_THRESHOLD,
+    # Our own overload rejections and callers' deadlines aren't backend failures
+    excluded=(SchedulerOverloaded, DeadlineExceeded)
+)
+# Identical analyses running at the same moment share one Ollama generation
+analysis_flights = SingleFlight()
+# How Ollama generations ended (completed / cancelled on disconnect / timed out)
+generation_stats = GenerationStats()
+# Patch-grid resize policy for the configured vision model (None = plain 1024px cap)
+vision_grid = grid_for_model(settings.OLLAMA_MODEL, settings.VISION_TOKEN_BUDGET)
+screenshot_cache = ScreenshotCache(
+    max_entries=settings.SCREENSHOT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SCREENSHOT_CACHE_TTL_SECONDS,
+    max_distance=settings.SCREENSHOT_CACHE_MAX_DISTANCE
+)
 
 # ========== HELPER FUNCTIONS ==========
 
-async def image_to_base64(image_file: UploadFile) -> str:
-    """Convert uploaded image to base64 for Ollama"""
+def observe_multipart_parse(request: Request):
+    """FastAPI parses the multipart form before the handler runs: time it from the request start"""
+    started = request.scope.get("state", {}).get("request_start")
+    if started is not None:
+        observe_stages({"multipart_parse": time.perf_counter() - started})
+
+async def image_to_base64(image_file: UploadFile) -> dict:
+    """Convert uploaded image to base64 for Ollama (+ size and perceptual hash)"""
     # Read image file
-    contents = await image_file.read()
-    
-    # Open with PIL to validate and optionally resize
-    image = Image.open(io.BytesIO(contents))
-    
-    # Convert to RGB if needed
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Resize if too large (Ollama works better with smaller images)
-    max_size = 1024
-    if max(image.size) > max_size:
-        ratio = max_size / max(image.size)
-        new_size = tuple(int(dim * ratio) for dim in image.size)
-        image = image.resize(new_size, Image.Resampling.LANCZOS)
-    
-    # Convert to base64
-    buffered = io.BytesIO()
-    image.save(buffered, format="JPEG", quality=85)
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    
-    return img_str
+    with timed("multipart_read"):
+        contents = await image_file.read()
+    return await prepare_screenshot(contents)
 
-async def analyze_with_ollama(image_base64: str, dom_elements: list) -> dict:
-    """Send to Ollama for analysis"""
-    messages = [
+async def prepare_screenshot(contents: bytes) -> dict:
+    """Image pipeline for raw upload bytes"""
+    # Decode, convert, resize and JPEG-encode on the image executor
+    # so a large screenshot doesn't block the event loop.
+    # Small RGB JPEGs are passed through untouched (processed["path"])
+    processed = await image_executor.run(
+        prepare_image_bytes, contents,
+        passthrough_max_bytes=settings.IMAGE_PASSTHROUGH_MAX_BYTES,
+        grid=vision_grid
+    )
+    # decode / resize / encode / base64 / hash, measured inside the executor
+    observe_stages(processed["timings"])
+    return processed
+
+def build_analysis_messages(image_base64: str, dom_elements: list) -> list:
+    """Chat messages for the page analysis prompt"""
+    # Most useful elements first (search box, cart...), not document order;
+    # as many as fit the token budget, one compact line each
+    ranked = rank_elements(dom_elements, settings.PROMPT_DOM_TOP_K)
+    dom_text, _ = serialize_dom_for_prompt(dom_elements, settings.PROMPT_DOM_TOKEN_BUDGET, order=ranked)
+    
+    return [
         {
             "role": "user",
             "content": f"""
             Analyze this webpage screenshot and suggest top 3 user actions.
             
-            Interactive elements: {json.dumps(dom_elements[:10], indent=2)}
+            Interactive elements (element_index is the first column):
+{dom_text}
             
             Return JSON:
             {{
@@ -94,46 +261,246 @@ async def analyze_with_ollama(image_base64: str, dom_elements: list) -> dict:
             "images": [image_base64]
         }
     ]
+
+async def session_not_found(session_id: str) -> HTTPException:
+    """410 for a session we dropped (the client should analyze the page again), 404 otherwise"""
+    reason = await sessions.evicted_reason(session_id)
+    if reason is not None:
+        return HTTPException(410, detail={
+            "error": "session_expired",
+            "reason": reason,
+            "message": "Session expired, analyze the page again"
+        })
+    return HTTPException(404, "Session not found")
+
+def add_session_token(response: dict, session: dict) -> dict:
+    """Attach a signed token carrying the session, when SESSION_TOKEN_SECRET is set"""
+    if session_tokens is not None:
+        response["session_token"] = session_tokens.issue(session)
+    return response
+
+def session_from_token(token: str) -> dict:
+    """Session carried by a token; 410 if it expired, 401 if it was tampered with"""
+    if session_tokens is None:
+        raise HTTPException(400, "Session tokens are not enabled on this server")
+    try:
+        return session_tokens.read(token)
+    except ExpiredSessionToken:
+        raise HTTPException(410, detail={
+            "error": "session_expired",
+            "reason": "token_expired",
+            "message": "Session expired, analyze the page again"
+        })
+    except InvalidSessionToken as e:
+        raise HTTPException(401, f"Invalid session token: {e}")
+
+def overloaded(e: SchedulerOverloaded) -> HTTPException:
+    """429 with Retry-After for a request the scheduler turned away"""
+    return HTTPException(
+        429,
+        detail=f"Analysis backend is busy ({e.reason}), please retry",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+async def analyze_with_ollama(image_base64: str, dom_elements: list, deadline: Optional[float] = None) -> dict:
+    """
+    Send to Ollama for analysis (deadline: seconds the caller can wait)
+    Ollama's timing breakdown rides along under "_ollama_timings" (see analyze_with_cache)
+    """
+    with timed("prompt_build"):
+        messages = build_analysis_messages(image_base64, dom_elements)
     
     try:
-        response = await client.post(
-            f"{settings.OLLAMA_BASE_URL}/api/chat",
-            json={
-                "model": settings.OLLAMA_MODEL,
-                "messages": messages,
-                "stream": False,
-                "options": {"temperature": 0.3}
-            }
-        )
+        async with ollama_breaker.guard(), ollama_scheduler.slot(deadline) as remaining, \
+                ollama_pool.request() as backend, generation_stats.track(), within_deadline(remaining):
+            # Cancelling this task (client disconnected) closes the connection,
+            # which makes Ollama stop generating
+            with timed("ollama_call"):
+                response = await client.post(
+                    f"{backend.url}/api/chat",
+                    json={
+                        "model": settings.OLLAMA_MODEL,
+                        "messages": messages,
+                        "stream": False,
+                        "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+                        "format": ANALYSIS_SCHEMA,  # Constrained decoding: output must match the schema
+                        "options": {"temperature": 0.3}
+                    },
+                    timeout=deadline_timeout(client, remaining)
+                )
+            if response.status_code >= 500:
+                response.raise_for_status()  # Counts against the backend and the circuit
         
         if response.status_code == 200:
-            result = response.json()
-            content = result["message"]["content"]
+            with timed("json_parse"):
+                result = response.json()
+                analysis = analysis_parser.parse(result["message"]["content"])
+            timings = record_ollama_timings(result, "analyze")
             
-            try:
-                return json.loads(content)
-            except:
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    try:
-                        return json.loads(json_match.group())
-                    except:
-                        pass
+            if analysis is not None:
+                if timings is not None:
+                    analysis["_ollama_timings"] = timings
+                return analysis
         
         # Fallback
         return create_fallback_analysis(dom_elements)
         
+    except SchedulerOverloaded as e:
+        print(f"Ollama busy: {e}")
+        if settings.OLLAMA_OVERLOAD_POLICY == "reject":
+            raise overloaded(e)
+        return create_fallback_analysis(dom_elements)
+    except CircuitOpen as e:
+        print(f"Ollama skipped: {e}")
+        return create_fallback_analysis(dom_elements)
+    except TimeoutError:
+        print("Ollama missed the request deadline")
+        return create_fallback_analysis(dom_elements)
     except Exception as e:
         print(f"Ollama error: {e}")
         return create_fallback_analysis(dom_elements)
 
+async def analyze_with_cache(image_base64: str, phash: int, dom_elements: list,
+                             deadline: Optional[float] = None) -> tuple:
+    """
+    Screenshot cache (+ single-flight) in front of analyze_with_ollama -> (analysis, cache_info)
+    Concurrent identical requests share the first caller's deadline.
+    cache_info["ollama_timings"] has Ollama's timing breakdown when Ollama was called.
+    """
+    if not settings.SCREENSHOT_CACHE_ENABLED:
+        analysis = await analysis_flights.do(
+            content_key(image_base64, dom_elements), analyze_with_ollama, image_base64, dom_elements, deadline
+        )
+        analysis = dict(analysis)
+        return analysis, {"hit": False, "ollama_timings": analysis.pop("_ollama_timings", None)}
+    
+    dom_fp = dom_fingerprint(dom_elements)
+    cached = screenshot_cache.get(phash, dom_fp)
+    if cached is not None:
+        analysis, distance = cached
+        return analysis, {"hit": True, "distance": distance}
+    
+    analysis = await analysis_flights.do(
+        content_key(image_base64, dom_elements), analyze_with_ollama, image_base64, dom_elements, deadline
+    )
+    analysis = dict(analysis)
+    timings = analysis.pop("_ollama_timings", None)
+    
+    # Don't pin a fallback answer for a page Ollama never actually saw
+    if not analysis.get("fallback"):
+        screenshot_cache.put(phash, dom_fp, analysis)
+    
+    return analysis, {"hit": False, "ollama_timings": timings}
+
+async def stream_analysis_with_ollama(image_base64: str, dom_elements: list, deadline: Optional[float] = None):
+    """
+    Streaming variant of analyze_with_ollama.
+    Yields {"type": "action", "action": {...}} as soon as each action is complete,
+    then {"type": "done", "analysis": {...}} with the full result.
+    If the client disconnects, Starlette cancels the response and the Ollama
+    stream is closed with it.
+    """
+    parser = ActionStreamParser()
+    streamed = []
+    analysis = None
+    with timed("prompt_build"):
+        messages = build_analysis_messages(image_base64, dom_elements)
+    
+    try:
+        async with ollama_breaker.guard(), ollama_scheduler.slot(deadline) as remaining, \
+                ollama_pool.request() as backend, generation_stats.track():
+            loop = asyncio.get_running_loop()
+            expires = loop.time() + remaining
+            request = client.build_request(
+                "POST",
+                f"{backend.url}/api/chat",
+                json={
+                    "model": settings.OLLAMA_MODEL,
+                    "messages": messages,
+                    "stream": True,
+                    "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+                    "format": ANALYSIS_SCHEMA,
+                    "options": {"temperature": 0.3}
+                },
+                timeout=deadline_timeout(client, remaining)
+            )
+            # The deadline covers the whole stream, but its timer can't stay open
+            # across the yields below, so each wait on Ollama gets what is left of it
+            async with within_deadline(remaining):
+                response = await client.send(request, stream=True)
+            try:
+                if response.status_code >= 500:
+                    response.raise_for_status()
+                if response.status_code == 200:
+                    # Ollama streams one JSON object per line
+                    lines = response.aiter_lines()
+                    while True:
+                        async with within_deadline(expires - loop.time()):
+                            line = await anext(lines, None)
+                        if line is None:
+                            break
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        for action in parser.feed(chunk.get("message", {}).get("content", "")):
+                            try:
+                                action = Action.model_validate(action).model_dump(exclude_none=True)
+                            except ValidationError:
+                                continue  # Don't show the user an action we can't execute
+                            streamed.append(action)
+                            yield {"type": "action", "action": action}
+                        if chunk.get("done"):
+                            record_ollama_timings(chunk, "analyze_stream")
+                            break
+                    with timed("json_parse"):
+                        analysis = analysis_parser.parse(parser.text)
+            finally:
+                await response.aclose()
+    except (SchedulerOverloaded, CircuitOpen) as e:
+        # Headers are already sent, so a busy backend always means the fallback here
+        print(f"Ollama busy: {e}")
+    except TimeoutError:
+        print("Ollama missed the request deadline")
+    except Exception as e:
+        print(f"Ollama error: {e}")
+    
+    if analysis is None and streamed:
+        # Completion got cut off / mangled after some actions were already sent.
+        # Marked partial: shown to the user, but never cached (see analyze_page_stream)
+        analysis = {"page_type": "generic", "page_summary": "", "actions": streamed, "partial": True}
+    
+    if analysis is None:
+        analysis = create_fallback_analysis(dom_elements)
+        for action in analysis["actions"]:
+            yield {"type": "action", "action": action}
+    
+    yield {"type": "done", "analysis": analysis}
+
+async def parse_dom_elements(dom_elements: Union[UploadFile, str]) -> list:
+    """
+    Decode the dom_elements form field: JSON text, or a file part whose
+    content type picks JSON or msgpack (application/msgpack)
+    """
+    if isinstance(dom_elements, str):
+        data, content_type = dom_elements, "application/json"
+    else:
+        if dom_elements.size is not None and dom_elements.size > dom_decoder.max_bytes:
+            raise HTTPException(413, f"dom_elements is larger than {dom_decoder.max_bytes} bytes")
+        data = await dom_elements.read(dom_decoder.max_bytes + 1)
+        content_type = dom_elements.content_type
+    try:
+        return dom_decoder.decode(data, content_type)
+    except DomPayloadError as e:
+        raise HTTPException(e.status, str(e))
+
 def create_fallback_analysis(dom_elements: list) -> dict:
-    """Fallback when Ollama fails"""
+    """Fallback when Ollama fails (also the instant first answer in progressive mode)"""
     actions = []
-    for i, elem in enumerate(dom_elements[:3]):
+    # Top 3 by the same heuristic ranking the prompt uses, not just the first 3
+    for n, i in enumerate(rank_elements(dom_elements, 3)):
+        elem = dom_elements[i]
         actions.append({
-            "id": f"action_{i}",
+            "id": f"action_{n}",
             "label": elem.get('text', f"Action {i}"),
             "description": f"Click {elem.get('tag', 'element')}",
             "element_index": i,
@@ -143,8 +510,84 @@ def create_fallback_analysis(dom_elements: list) -> dict:
     return {
         "page_type": "generic",
         "page_summary": "Fallback analysis",
-        "actions": actions
+        "actions": actions,
+        "fallback": True
+    }
+
+# ========== PROGRESSIVE (TWO-PHASE) ANALYSIS ==========
+
+# session_id -> Event set when the pending LLM analysis for that session lands
+analysis_upgrades = {}
+# Strong refs so background upgrades aren't garbage collected mid-flight
+background_tasks = set()
+
+def is_complete_for(session: dict, dom_fp: str) -> bool:
+    """Whether a stored session holds a complete (not partial/fallback) analysis of this page"""
+    analysis = session.get("page_analysis") or {}
+    return (not analysis.get("fallback") and not analysis.get("partial")
+            and dom_fingerprint(session.get("dom_elements") or []) == dom_fp)
+
+def upgrade_give_up(session: dict) -> float:
+    """time.monotonic() after which a pending upgrade is abandoned (its deadline plus the HTTP grace)"""
+    expires = session.get("analysis_expires", time.time() + settings.OLLAMA_REQUEST_DEADLINE)
+    return time.monotonic() + (expires - time.time()) + DEADLINE_GRACE + 1.0
+
+def analysis_snapshot(session_id: str, session: dict) -> dict:
+    snapshot = {
+        "session_id": session_id,
+        "analysis": session["page_analysis"],
+        "analysis_version": session.get("analysis_version", 1),
+        "analysis_status": session.get("analysis_status", "complete"),
+        "analysis_source": session.get("analysis_source", "llm")
     }
+    if "debug" in session:
+        snapshot["debug"] = session["debug"]  # progressive analyze with debug=true
+    return snapshot
+
+def start_analysis_upgrade(session_id: str, request_id: str, contents: bytes, elements: list,
+                           expires: float, debug: bool = False):
+    """
+    Run the LLM analysis in the background and swap it into the session when done.
+    expires: time.time() by which it must finish (the session's analysis_expires)
+    """
+    # A newer analyze for the session replaces the event; the older upgrade still sets its own
+    event = analysis_upgrades[session_id] = asyncio.Event()
+    
+    task = asyncio.create_task(upgrade_analysis(session_id, request_id, contents, elements, event, expires, debug))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def upgrade_analysis(session_id: str, request_id: str, contents: bytes, elements: list,
+                           event: asyncio.Event, expires: float, debug: bool = False):
+    try:
+        try:
+            processed = await prepare_screenshot(contents)
+            remaining = expires - time.time()
+            if remaining <= 0:
+                raise TimeoutError("deadline passed while preparing the screenshot")
+            analysis, cache_info = await analyze_with_cache(processed["image"], processed["phash"], elements, remaining)
+        except Exception as e:
+            # Includes a 429 under OLLAMA_OVERLOAD_POLICY=reject: the heuristic answer stands
+            print(f"Background analysis failed for {session_id}: {e}")
+            analysis, cache_info = None, {}
+        
+        session = await sessions.get(session_id)
+        if session is None or session.get("analysis_request") != request_id:
+            return  # Session expired, or a newer analysis superseded this one
+        
+        if analysis is not None and not analysis.get("fallback"):
+            session["page_analysis"] = analysis
+            session["analysis_version"] += 1
+            session["analysis_source"] = "llm"
+        if debug:
+            session["debug"] = {"ollama_timings": cache_info.get("ollama_timings")}
+        session["analysis_status"] = "complete"
+        await sessions.put(session_id, session)  # Re-estimate its size
+    finally:
+        # Wake /events subscribers even when the session is gone or superseded
+        if analysis_upgrades.get(session_id) is event:
+            del analysis_upgrades[session_id]
+        event.set()
 
 # ========== ENDPOINTS ==========
 
@@ -155,25 +598,62 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Check backend and Ollama"""
-    try:
-        response = await client.get(f"{settings.OLLAMA_BASE_URL}/api/tags")
-        ollama_ok = response.status_code == 200
-    except:
-        ollama_ok = False
+    # Same /api/tags check the background probes use, against every backend
+    results = await ollama_pool.probe_all(client)
+    ollama_ok = any(results)
+    circuit = ollama_breaker.stats()
     
     return {
-        "status": "healthy" if ollama_ok else "degraded",
+        # An open circuit means analyses are currently served by the fallback
+        "status": "healthy" if ollama_ok and circuit["state"] == "closed" else "degraded",
         "ollama_connected": ollama_ok,
-        "ollama_model": settings.OLLAMA_MODEL
+        "ollama_model": settings.OLLAMA_MODEL,
+        "ollama_backends": [
+            {"url": backend.url, "connected": ok} for backend, ok in zip(ollama_pool.backends, results)
+        ],
+        "ollama_circuit": circuit
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for the load balancer: 200 only once the model is loaded (cold/warming -> 503)"""
+    state = model_warmer.state if settings.OLLAMA_WARMUP_ENABLED else "ready"
+    return JSONResponse(
+        status_code=200 if state == "ready" else 503,
+        content={"status": state, "model": model_warmer.stats() if settings.OLLAMA_WARMUP_ENABLED else None}
+    )
+
+@app.get("/api/stats")
+async def get_stats():
+    """Internal counters for tuning (cache hit rate etc.)"""
+    return {
+        "screenshot_cache": screenshot_cache.stats(),
+        "analysis_singleflight": analysis_flights.stats(),
+        "ollama_scheduler": ollama_scheduler.stats(),
+        "ollama_backends": ollama_pool.stats(),
+        "analysis_schema": analysis_parser.stats(),
+        "dom_decoder": dom_decoder.stats(),
+        "ollama_generations": generation_stats.stats(),
+        "sessions": await sessions.stats(),
+        "session_tokens": session_tokens.stats() if session_tokens else None
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-endpoint requests/latency, analysis stages, Ollama timing breakdown"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # ========== MAIN ENDPOINT WITH FILE UPLOAD ==========
 
 @app.post("/api/analyze-page")
 async def analyze_page(
+    request: Request,
     screenshot: UploadFile = File(...),      # ← CHANGED: Now a FILE upload!
-    dom_elements: str = Form(...),
-    session_id: Optional[str] = Form(None)
+    dom_elements: Union[UploadFile, str] = Form(...),
+    session_id: Optional[str] = Form(None),
+    progressive: bool = Form(False),
+    deadline_seconds: Optional[float] = Form(None),
+    debug: bool = Form(False)
 ):
     """
     Analyze webpage - UPLOAD IMAGE FILE directly!
@@ -182,7 +662,17 @@ async def analyze_page(
     - screenshot: Image file (PNG, JPG, etc.)
     - dom_elements: JSON string of interactive elements
     - session_id: Optional session ID
+    - progressive: Return a heuristic analysis (version 1) immediately and upgrade
+      it with the LLM analysis in the background; fetch it from
+      GET /api/analysis/{session_id} or subscribe to .../events
+    - deadline_seconds: How long the client will wait for the LLM (default
+      OLLAMA_REQUEST_DEADLINE); past it the fallback analysis is returned
+    - debug: Include Ollama's timing breakdown (model load, prompt eval,
+      generation) under "debug"
+    
+    If the client disconnects mid-analysis the Ollama generation is cancelled.
     """
+    observe_multipart_parse(request)
     try:
         # Validate image file
         if not screenshot.content_type.startswith('image/'):
@@ -195,83 +685,272 @@ async def analyze_page(
             session_id = str(uuid.uuid4())
         
         # Parse DOM elements
-        try:
-            elements = json.loads(dom_elements)
-        except json.JSONDecodeError:
-            # Try to fix JSON
-            dom_elements = dom_elements.replace("'", '"')
-            elements = json.loads(dom_elements)
+        with timed("dom_parse"):
+            elements = await parse_dom_elements(dom_elements)
+        
+        if progressive:
+            # Read now: the upload is closed once this response is sent
+            contents = await screenshot.read()
+            previous = await sessions.get(session_id) or {}
+            session = {
+                "page_analysis": create_fallback_analysis(elements),
+                "dom_elements": elements,
+                "image_filename": screenshot.filename,
+                "analysis_version": previous.get("analysis_version", 0) + 1,
+                "analysis_status": "pending",
+                "analysis_source": "heuristic",
+                "analysis_request": str(uuid.uuid4()),
+                # Wall clock, so /events on any worker knows when the upgrade is abandoned
+                "analysis_expires": time.time() + (deadline_seconds or settings.OLLAMA_REQUEST_DEADLINE)
+            }
+            await sessions.put(session_id, session)
+            start_analysis_upgrade(session_id, session["analysis_request"], contents, elements,
+                                   session["analysis_expires"], debug)
+            
+            return add_session_token({
+                **analysis_snapshot(session_id, session),
+                "elements_count": len(elements),
+                "timestamp": asyncio.get_event_loop().time()
+            }, session)
         
         # Convert image to base64 for Ollama
         print("Converting image to base64...")
-        image_base64 = await image_to_base64(screenshot)
+        processed = await image_to_base64(screenshot)
+        image_base64 = processed["image"]
         
-        print(f"Image converted, size: {len(image_base64)} chars")
+        print(f"Image converted ({processed['path']}), size: {len(image_base64)} chars, "
+              f"vision tokens: {processed['vision_tokens']}")
         print(f"Calling Ollama with {len(elements)} DOM elements...")
         
-        # Call Ollama
-        analysis = await analyze_with_ollama(image_base64, elements)
+        # Call Ollama (or reuse the analysis of a near-identical screenshot)
+        analysis, cache_info = await run_until_disconnected(
+            request, analyze_with_cache(image_base64, processed["phash"], elements, deadline_seconds)
+        )
         
         # Store session
-        sessions[session_id] = {
+        session = {
             "page_analysis": analysis,
             "dom_elements": elements,
             "image_filename": screenshot.filename
         }
+        with timed("session_store"):
+            await sessions.put(session_id, session)
         
-        return {
+        response = {
             "session_id": session_id,
             "analysis": analysis,
             "image_info": {
                 "filename": screenshot.filename,
                 "content_type": screenshot.content_type,
-                "size_bytes": screenshot.size
+                "size_bytes": screenshot.size,
+                "pipeline_path": processed["path"],
+                "sent_size": [processed["width"], processed["height"]],
+                "vision_tokens": processed["vision_tokens"]
             },
             "elements_count": len(elements),
+            "cache_hit": cache_info["hit"],
             "timestamp": asyncio.get_event_loop().time()
         }
+        if debug:
+            response["debug"] = {"ollama_timings": cache_info.get("ollama_timings")}
+        return add_session_token(response, session)
         
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        print(f"Client disconnected, analysis cancelled ({session_id})")
+        raise HTTPException(499, "Client closed request")
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(500, detail=str(e))
 
+# ========== STREAMING VERSION ==========
+
+@app.post("/api/analyze-page-stream")
+async def analyze_page_stream(
+    request: Request,
+    screenshot: UploadFile = File(...),
+    dom_elements: Union[UploadFile, str] = Form(...),
+    session_id: Optional[str] = Form(None),
+    deadline_seconds: Optional[float] = Form(None)
+):
+    """
+    Same inputs as /api/analyze-page, but answers with NDJSON events:
+    - {"type": "session", ...}  session id + image info, sent immediately
+    - {"type": "action", "action": {...}}  one per action, as soon as the model finishes it
+    - {"type": "done", "analysis": {...}, "cache_hit": bool}  final analysis (authoritative)
+    """
+    observe_multipart_parse(request)
+    if not screenshot.content_type.startswith('image/'):
+        raise HTTPException(400, "File must be an image")
+    
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    
+    try:
+        with timed("dom_parse"):
+            elements = await parse_dom_elements(dom_elements)
+        processed = await image_to_base64(screenshot)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise HTTPException(500, detail=str(e))
+    
+    async def events():
+        yield json.dumps({
+            "type": "session",
+            "session_id": session_id,
+            "image_info": {
+                "filename": screenshot.filename,
+                "pipeline_path": processed["path"],
+                "vision_tokens": processed["vision_tokens"]
+            },
+            "elements_count": len(elements)
+        }) + "\n"
+        
+        dom_fp = dom_fingerprint(elements)
+        cached = screenshot_cache.get(processed["phash"], dom_fp) if settings.SCREENSHOT_CACHE_ENABLED else None
+        
+        if cached is not None:
+            analysis = cached[0]
+            for action in analysis.get("actions", []):
+                yield json.dumps({"type": "action", "action": action}) + "\n"
+        else:
+            async for event in stream_analysis_with_ollama(processed["image"], elements, deadline_seconds):
+                if event["type"] == "done":
+                    analysis = event["analysis"]
+                    break
+                yield json.dumps(event) + "\n"
+            complete = not analysis.get("fallback") and not analysis.get("partial")
+            if settings.SCREENSHOT_CACHE_ENABLED and complete:
+                screenshot_cache.put(processed["phash"], dom_fp, analysis)
+        
+        session = {
+            "page_analysis": analysis,
+            "dom_elements": elements,
+            "image_filename": screenshot.filename
+        }
+        with timed("session_store"):
+            previous = await sessions.get(session_id) if analysis.get("partial") else None
+            if previous is not None and not is_complete_for(previous, dom_fp):
+                previous = None
+            if previous is None:
+                await sessions.put(session_id, session)
+            else:
+                session = previous  # A cut-off stream doesn't replace a complete analysis of this page
+        
+        done = {"type": "done", "analysis": session["page_analysis"], "cache_hit": cached is not None}
+        yield json.dumps(add_session_token(done, session)) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 # ========== ALTERNATIVE: Base64 version (for compatibility) ==========
 
 @app.post("/api/analyze-page-base64")
 async def analyze_page_base64(
+    request: Request,
     screenshot: str = Form(...),  # Base64 string
-    dom_elements: str = Form(...),
-    session_id: Optional[str] = Form(None)
+    dom_elements: Union[UploadFile, str] = Form(...),
+    session_id: Optional[str] = Form(None),
+    deadline_seconds: Optional[float] = Form(None)
 ):
     """Alternative endpoint for base64 strings"""
+    observe_multipart_parse(request)
     try:
         if not session_id:
             session_id = str(uuid.uuid4())
         
-        elements = json.loads(dom_elements)
+        with timed("dom_parse"):
+            elements = await parse_dom_elements(dom_elements)
         
         # Clean base64 if it has data URL prefix
         if screenshot.startswith('data:image'):
             screenshot = screenshot.split(',')[1]
         
-        analysis = await analyze_with_ollama(screenshot, elements)
+        try:
+            image_bytes = base64.b64decode(screenshot)
+        except binascii.Error as e:
+            raise HTTPException(400, f"screenshot is not valid base64: {e}")
+        try:
+            phash = await image_executor.run(hash_image_bytes, image_bytes)
+        except OSError as e:  # Pillow can't identify / read the image
+            raise HTTPException(400, f"screenshot is not a readable image: {e}")
+        analysis, cache_info = await run_until_disconnected(
+            request, analyze_with_cache(screenshot, phash, elements, deadline_seconds)
+        )
         
-        sessions[session_id] = {
+        session = {
             "page_analysis": analysis,
             "dom_elements": elements
         }
+        with timed("session_store"):
+            await sessions.put(session_id, session)
         
-        return {
+        return add_session_token({
             "session_id": session_id,
             "analysis": analysis,
-            "elements_count": len(elements)
-        }
+            "elements_count": len(elements),
+            "cache_hit": cache_info["hit"]
+        }, session)
         
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        raise HTTPException(499, "Client closed request")
     except Exception as e:
         raise HTTPException(500, detail=str(e))
 
 # ========== OTHER ENDPOINTS (unchanged) ==========
 
+@app.get("/api/analysis/{session_id}")
+async def get_analysis(session_id: str):
+    """Latest analysis for a session (poll this after a progressive analyze)"""
+    session = await sessions.get(session_id)
+    if session is None:
+        raise await session_not_found(session_id)
+    return analysis_snapshot(session_id, session)
+
+@app.get("/api/analysis/{session_id}/events")
+async def analysis_events(session_id: str):
+    """
+    NDJSON subscription: the current analysis right away, then the upgraded one
+    when the background LLM analysis finishes. Ends once nothing is pending.
+    """
+    session = await sessions.get(session_id)
+    if session is None:
+        raise await session_not_found(session_id)
+    
+    async def events():
+        snapshot = analysis_snapshot(session_id, session)
+        yield json.dumps(snapshot) + "\n"
+        
+        give_up = upgrade_give_up(session)
+        while snapshot["analysis_status"] == "pending":
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                return
+            event = analysis_upgrades.get(session_id)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return
+            else:
+                # The upgrade runs in another worker: poll the shared session store
+                await asyncio.sleep(min(0.5, remaining))
+            current = await sessions.get(session_id)
+            if current is None:
+                return
+            latest = analysis_snapshot(session_id, current)
+            if latest["analysis_status"] == "pending" and latest["analysis_version"] == snapshot["analysis_version"]:
+                continue
+            snapshot = latest
+            give_up = upgrade_give_up(current)  # A newer analyze brings its own deadline
+            yield json.dumps(snapshot) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.post("/api/transcribe")
 async def transcribe_audio(audio: UploadFile = File(...)):
     """Transcribe audio file"""
@@ -290,13 +969,23 @@ async def transcribe_audio(audio: UploadFile = File(...)):
 @app.post("/api/interpret-command")
 async def interpret_command(
     command: str = Form(...),
-    session_id: str = Form(...)
+    session_id: Optional[str] = Form(None),
+    session_token: Optional[str] = Form(None)
 ):
-    """Interpret user command"""
-    if session_id not in sessions:
-        raise HTTPException(404, "Session not found")
+    """
+    Interpret user command against a stored session (session_id) or the
+    signed session_token returned by the analyze endpoints.
+    410 if the session expired: analyze the page again
+    """
+    if session_token:
+        session = session_from_token(session_token)
+    elif session_id:
+        session = await sessions.get(session_id)
+        if session is None:
+            raise await session_not_found(session_id)
+    else:
+        raise HTTPException(400, "session_id or session_token is required")
     
-    session = sessions[session_id]
     actions = session["page_analysis"]["actions"]
     
     # Simple keyword matching
@@ -372,7 +1061,6 @@ async def download_test_image():
     img.save(img_bytes, format='PNG')
     img_bytes.seek(0)
     
-    from fastapi.responses import StreamingResponse
     return StreamingResponse(
         img_bytes,
         media_type="image/png",
@@ -382,6 +1070,7 @@ async def download_test_image():
 if __name__ == "__main__":
     print(f"🚀 Starting A11y Overlay API")
     print(f"📁 Upload images to: POST /api/analyze-page")
+    print(f"⚡ Streaming (NDJSON): POST /api/analyze-page-stream")
     print(f"📋 Base64 alternative: POST /api/analyze-page-base64")
     print(f"📚 Docs: http://localhost:{settings.PORT}/docs")
     
@@ -0,0 +1,226 @@
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+# Sub-millisecond resolution for in-process stages (DOM parse, prompt build...)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Prometheus histogram. observe() is one bisect plus a few list updates;
+    buckets are only made cumulative when rendering.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS,
+                 labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(labels)
+        # labels -> [per-bucket counts (+inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def summary(self, *labels: str) -> Optional[Dict[str, float]]:
+        series = self._series.get(labels)
+        if series is None:
+            return None
+        return {"count": series[2], "mean": series[1] / series[2]}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS,
+                  labels: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(name, help, buckets, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- HTTP endpoints ----
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Requests handled", labels=("method", "path", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request start to the last response byte",
+    STAGE_BUCKETS, labels=("method", "path"))
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware, so streaming is untouched):
+    counts requests and times them per route template, e.g. /api/analysis/{session_id}.
+    Also stores the start time in scope["state"]["request_start"] for stage timing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["request_start"] = started
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the scope
+            path = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], path, str(status))
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"], path)
+
+
+# ---- Stages of an analysis ----
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "analysis_stage_duration_seconds", "Time per analysis stage", STAGE_BUCKETS, labels=("stage",))
+
+
+class timed:
+    """with timed("prompt_build"): ...  -> one observation of that stage (~1 µs overhead)"""
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_LATENCY.observe(time.perf_counter() - self.started, self.stage)
+
+
+def observe_stages(timings: Dict[str, float]):
+    """Record stage timings measured elsewhere (e.g. inside the image executor)"""
+    for stage, seconds in timings.items():
+        STAGE_LATENCY.observe(seconds, stage)
+
+
+# ---- Session store ----
+
+SESSION_EVICTIONS = REGISTRY.counter(
+    "session_evictions_total", "Sessions dropped from the store", labels=("reason",))
+
+
+# ---- Ollama's own timing breakdown (from the final response of every generation) ----
+
+OLLAMA_LOAD = REGISTRY.histogram(
+    "ollama_load_duration_seconds", "Time Ollama spent loading the model", labels=("call",))
+OLLAMA_PROMPT_EVAL = REGISTRY.histogram(
+    "ollama_prompt_eval_duration_seconds", "Time Ollama spent evaluating the prompt (incl. image)", labels=("call",))
+OLLAMA_PROMPT_TOKENS = REGISTRY.histogram(
+    "ollama_prompt_eval_tokens", "Prompt tokens evaluated", TOKEN_BUCKETS, labels=("call",))
+OLLAMA_EVAL = REGISTRY.histogram(
+    "ollama_eval_duration_seconds", "Time Ollama spent generating the answer", labels=("call",))
+OLLAMA_EVAL_TOKENS = REGISTRY.histogram(
+    "ollama_eval_tokens", "Tokens generated", TOKEN_BUCKETS, labels=("call",))
+OLLAMA_TOTAL = REGISTRY.histogram(
+    "ollama_total_duration_seconds", "Total time Ollama reported for the call", labels=("call",))
+
+
+def ollama_timings(result: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """Timing fields of an Ollama response (nanoseconds) in seconds / token counts"""
+    if "total_duration" not in result and "eval_count" not in result:
+        return None
+    return {
+        "load_s": result.get("load_duration", 0) / 1e9,
+        "prompt_eval_tokens": result.get("prompt_eval_count", 0),
+        "prompt_eval_s": result.get("prompt_eval_duration", 0) / 1e9,
+        "eval_tokens": result.get("eval_count", 0),
+        "eval_s": result.get("eval_duration", 0) / 1e9,
+        "total_s": result.get("total_duration", 0) / 1e9
+    }
+
+
+def record_ollama_timings(result: Dict[str, Any], call: str) -> Optional[Dict[str, float]]:
+    """Add one response's timings to the histograms; returns them (None if Ollama sent none)"""
+    timings = ollama_timings(result)
+    if timings is None:
+        return None
+    OLLAMA_LOAD.observe(timings["load_s"], call)
+    OLLAMA_PROMPT_EVAL.observe(timings["prompt_eval_s"], call)
+    OLLAMA_PROMPT_TOKENS.observe(timings["prompt_eval_tokens"], call)
+    OLLAMA_EVAL.observe(timings["eval_s"], call)
+    OLLAMA_EVAL_TOKENS.observe(timings["eval_tokens"], call)
+    OLLAMA_TOTAL.observe(timings["total_s"], call)
+    return timings
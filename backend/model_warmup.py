@@ -0,0 +1,118 @@
+import asyncio
+import base64
+import io
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+
+
+def tiny_image_base64(size: int = 28) -> str:
+    """One-patch JPEG: enough to load the vision tower without real prompt-eval cost"""
+    buffered = io.BytesIO()
+    Image.new("RGB", (size, size), "white").save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
+class ModelWarmer:
+    """
+    Loads the model on every Ollama backend at startup and keeps it resident.
+    Each backend gets a tiny image prompt with keep_alive; the prompt is repeated
+    every refresh_interval so the model comes back after an Ollama restart or an
+    unload. state is READY once at least one backend has answered.
+    """
+
+    def __init__(self, model: str, keep_alive: str = "30m", timeout: float = 120.0,
+                 refresh_interval: float = 600.0, retry_interval: float = 10.0):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval  # used while some backend is still cold
+
+        self.backend_states: Dict[str, str] = {}
+        self.load_durations: Dict[str, float] = {}   # seconds Ollama reported for loading
+        self.last_warmed: Dict[str, float] = {}
+        self._image = tiny_image_base64()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def state(self) -> str:
+        states = self.backend_states.values()
+        if READY in states:
+            return READY
+        if WARMING in states:
+            return WARMING
+        return COLD
+
+    async def warm_backend(self, client: httpx.AsyncClient, url: str) -> bool:
+        if self.backend_states.get(url) != READY:
+            self.backend_states[url] = WARMING
+        try:
+            response = await client.post(
+                f"{url}/api/chat",
+                json={
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": "Reply OK.", "images": [self._image]}],
+                    "stream": False,
+                    "keep_alive": self.keep_alive,
+                    "options": {"num_predict": 1}
+                },
+                timeout=self.timeout
+            )
+            ok = response.status_code == 200
+            if ok:
+                # Ollama reports durations in nanoseconds
+                self.load_durations[url] = response.json().get("load_duration", 0) / 1e9
+        except Exception as e:
+            print(f"Warmup failed for {url}: {e}")
+            ok = False
+
+        self.backend_states[url] = READY if ok else COLD
+        if ok:
+            self.last_warmed[url] = time.time()
+        return ok
+
+    async def warm_all(self, client: httpx.AsyncClient, urls: List[str]) -> List[bool]:
+        return await asyncio.gather(*(self.warm_backend(client, url) for url in urls))
+
+    async def _warm_loop(self, client: httpx.AsyncClient, urls: List[str]):
+        while True:
+            results = await self.warm_all(client, urls)
+            await asyncio.sleep(self.refresh_interval if all(results) else self.retry_interval)
+
+    def start(self, client: httpx.AsyncClient, urls: List[str]):
+        """Warm in the background so startup isn't blocked on model load"""
+        for url in urls:
+            self.backend_states.setdefault(url, COLD)
+        if self._task is None:
+            self._task = asyncio.create_task(self._warm_loop(client, urls))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "backends": {
+                url: {
+                    "state": state,
+                    "load_duration_s": round(self.load_durations[url], 3) if url in self.load_durations else None,
+                    "last_warmed": self.last_warmed.get(url)
+                }
+                for url, state in self.backend_states.items()
+            }
+        }
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import httpx
+
+
+class NoHealthyBackend(Exception):
+    """Every Ollama backend is currently ejected"""
+
+
+async def ollama_tags_ok(client: httpx.AsyncClient, base_url: str, timeout: float = 5.0) -> bool:
+    """The /health check: does GET {base_url}/api/tags answer 200?"""
+    try:
+        response = await client.get(f"{base_url}/api/tags", timeout=timeout)
+        return response.status_code == 200
+    except Exception:
+        return False
+
+
+class OllamaBackend:
+    """One Ollama endpoint plus its live routing state"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.retry_at = 0.0           # when an ejected backend may get a trial request
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.latency_ewma: Optional[float] = None
+        self.last_latency: Optional[float] = None
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.last_latency = latency
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        self.healthy = True
+
+    def record_failure(self, eject_after: int, cooldown: float):
+        self.requests += 1
+        self.failures += 1
+        self.mark_down(eject_after, cooldown)
+
+    def mark_down(self, eject_after: int, cooldown: float):
+        """Count one consecutive failure; eject once there are eject_after in a row"""
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= eject_after:
+            if self.healthy:
+                self.ejections += 1
+            self.healthy = False
+            self.retry_at = time.monotonic() + cooldown
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_ewma_s": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "last_latency_s": round(self.last_latency, 3) if self.last_latency is not None else None
+        }
+
+
+class OllamaPool:
+    """
+    Least-outstanding-requests routing over several Ollama endpoints.
+    A backend is ejected after eject_after consecutive failures (request errors
+    or failed probes). It is re-admitted by a successful /api/tags probe, or it
+    gets a single trial request once cooldown seconds have passed.
+    Exceptions in `excluded` (e.g. the caller's own deadline running out) and
+    cancellation count neither as a failure nor as a success.
+    """
+
+    def __init__(self, urls: List[str], eject_after: int = 3, probe_interval: float = 10.0,
+                 probe_timeout: float = 2.0, cooldown: float = 10.0,
+                 excluded: Tuple[Type[BaseException], ...] = ()):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one backend URL")
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.cooldown = cooldown
+        self.excluded = excluded
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def pick(self) -> OllamaBackend:
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b.healthy]
+        if not candidates:
+            # Nothing healthy: hand out trial requests to backends past their cooldown
+            candidates = [b for b in self.backends if b.retry_at <= now]
+        if not candidates:
+            raise NoHealthyBackend("All Ollama backends are ejected")
+
+        backend = min(candidates, key=lambda b: (b.outstanding, b.latency_ewma or 0.0))
+        if not backend.healthy:
+            backend.retry_at = now + self.cooldown  # one trial per cooldown
+        return backend
+
+    @asynccontextmanager
+    async def request(self):
+        """Route one Ollama call: yields the chosen backend, records latency / failure"""
+        backend = self.pick()
+        backend.outstanding += 1
+        started = time.monotonic()
+        try:
+            yield backend
+            backend.record_success(time.monotonic() - started)
+        except self.excluded:
+            raise
+        except Exception:
+            backend.record_failure(self.eject_after, self.cooldown)
+            raise
+        finally:
+            backend.outstanding -= 1
+
+    async def probe(self, client: httpx.AsyncClient, backend: OllamaBackend) -> bool:
+        ok = await ollama_tags_ok(client, backend.url, timeout=self.probe_timeout)
+        if ok:
+            backend.consecutive_failures = 0
+            backend.healthy = True
+        else:
+            backend.mark_down(self.eject_after, self.cooldown)
+        return ok
+
+    async def probe_all(self, client: httpx.AsyncClient) -> List[bool]:
+        return await asyncio.gather(*(self.probe(client, b) for b in self.backends))
+
+    async def _probe_loop(self, client: httpx.AsyncClient):
+        while True:
+            await self.probe_all(client)
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self, client: httpx.AsyncClient):
+        """Start background health probes (call from the app lifespan)"""
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe_loop(client))
+
+    async def stop(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def healthy_count(self) -> int:
+        return sum(1 for b in self.backends if b.healthy)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [b.stats() for b in self.backends]
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+
+class SchedulerOverloaded(Exception):
+    """Raised instead of queueing a request that could not finish before its deadline"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Ollama overloaded ({reason}), retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class OllamaScheduler:
+    """
+    Admission control in front of Ollama.
+    At most max_concurrency generations run at once and at most max_queue wait
+    for a slot. A request that would have to queue is rejected up front when
+    the queue is full or when its projected wait plus the typical generation
+    time would overrun its deadline, so it can fail fast instead of timing out
+    after 30 s. A free slot is always taken: the deadline then bounds the call itself.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 16,
+                 default_deadline: float = 30.0, initial_service_time: float = 8.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._service_time = initial_service_time  # EWMA of generation time (s)
+        self.active = 0
+        self.waiting = 0
+
+        self.admitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+        self.expired_in_queue = 0
+
+    def projected_wait(self) -> float:
+        """Expected seconds before a new request gets a slot"""
+        if self.active < self.max_concurrency and self.waiting == 0:
+            return 0.0
+        # Everyone queued ahead of us, plus us, drains max_concurrency at a time
+        return (self.waiting + 1) / self.max_concurrency * self._service_time
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None):
+        """
+        Hold one Ollama slot for the duration of the block.
+        deadline: seconds from now by which the caller needs its answer.
+        Yields the seconds left on the deadline (use it as the HTTP timeout).
+        """
+        budget = deadline or self.default_deadline
+        expires = time.monotonic() + budget
+
+        wait = self.projected_wait()
+        if wait > 0:
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise SchedulerOverloaded("queue_full", wait)
+            if wait + self._service_time > budget:
+                self.rejected_deadline += 1
+                raise SchedulerOverloaded("deadline", wait)
+
+        self.waiting += 1
+        try:
+            # Stop waiting once there is no longer time left to run the generation
+            # (no wait at all when a slot is free)
+            timeout = max(0.0, budget - self._service_time) if wait > 0 else None
+            await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.expired_in_queue += 1
+            raise SchedulerOverloaded("deadline", self.projected_wait())
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield max(0.0, expires - started)
+        except (asyncio.CancelledError, GeneratorExit):
+            raise  # The caller went away: says nothing about generation time
+        except BaseException:
+            # Timed out or failed: the generation would have taken at least this long,
+            # so it may raise the estimate but never lower it (fast 5xx, refused connections)
+            self._observe(max(time.monotonic() - started, self._service_time))
+            self.failed += 1
+            raise
+        else:
+            self._observe(time.monotonic() - started)
+            self.completed += 1
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def _observe(self, seconds: float):
+        self._service_time = 0.8 * self._service_time + 0.2 * seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "service_time_ewma_s": round(self._service_time, 3),
+            "projected_wait_s": round(self.projected_wait(), 3),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_deadline": self.rejected_deadline,
+            "expired_in_queue": self.expired_in_queue
+        }
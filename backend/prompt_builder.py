@@ -0,0 +1,51 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# One line per element: index|tag[:type]|text|id
+# classes, selector and bounds are left out: the model never needs them
+# (selectors/bounds are added back from the index after the model answers)
+HEADER = "index|tag[:type]|text|id"
+MAX_TEXT_CHARS = 60
+CHARS_PER_TOKEN = 4  # rough average for English UI text with this tokenizer family
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clean(value, limit: int) -> str:
+    text = " ".join(str(value or "").split()).replace("|", "/")
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def element_line(index: int, elem: Dict) -> str:
+    tag = _clean(elem.get("tag"), 20) or "?"
+    elem_type = _clean(elem.get("type"), 20)
+    if elem_type and elem_type != tag:
+        tag = f"{tag}:{elem_type}"
+    text = elem.get("text") or elem.get("placeholder")  # empty inputs: the placeholder says what they're for
+    return f"{index}|{tag}|{_clean(text, MAX_TEXT_CHARS)}|{_clean(elem.get('id'), 30)}"
+
+
+def serialize_dom_for_prompt(dom_elements: List[Dict], token_budget: int = 400,
+                             order: Optional[Iterable[int]] = None) -> Tuple[str, List[int]]:
+    """
+    Compact element listing that fits token_budget (header included).
+    order: element indices in priority order (default: document order).
+    Lines keep the element's index in dom_elements, so element_index in the
+    model's answer always refers back to the original list.
+    Returns (text, indices included).
+    """
+    lines = [HEADER]
+    used = estimate_tokens(HEADER) + 1
+    included = []
+
+    for index in (order if order is not None else range(len(dom_elements))):
+        line = element_line(index, dom_elements[index])
+        cost = estimate_tokens(line) + 1  # + newline
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+        included.append(index)
+
+    return "\n".join(lines), included
@@ -16,10 +16,26 @@ def main():
     # Development mode detection
     reload = os.getenv("ENV", "development") == "development"
     
+    # Several workers need a shared session store (SESSION_BACKEND=sqlite or redis)
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        reload = False  # uvicorn can't reload with multiple workers
+        try:
+            from config import settings
+            session_backend = settings.SESSION_BACKEND
+        except ImportError:
+            session_backend = os.getenv("SESSION_BACKEND", "memory")
+        if session_backend == "memory":
+            # Each worker would keep its own sessions: requests that land on another worker get 404s
+            print(f"❌ WORKERS={workers} needs a shared session store, but SESSION_BACKEND=memory")
+            print("   Set SESSION_BACKEND=sqlite (one host) or redis (many hosts), or run a single worker")
+            sys.exit(1)
+    
     print(f"🚀 Starting A11y Overlay API")
     print(f"📡 Host: {host}")
     print(f"🔌 Port: {port}")
     print(f"🔄 Reload: {reload}")
+    print(f"👷 Workers: {workers}")
     print(f"🤖 Ollama: http://localhost:11434")
     print(f"📚 API Docs: http://{host}:{port}/docs")
     print(f"🔧 Health: http://{host}:{port}/health")
@@ -31,6 +47,7 @@ def main():
         host=host,
         port=port,
         reload=reload,
+        workers=workers,
         log_level="info"
     )
 
@@ -0,0 +1,108 @@
+import copy
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fields that identify an element; bounds are left out so scrolling
+# or a slightly different viewport still matches the same page
+FINGERPRINT_FIELDS = ("tag", "text", "type", "selector")
+
+
+def dom_fingerprint(dom_elements: List[Dict]) -> str:
+    """Stable short hash of the interactive elements on a page"""
+    compact = [[elem.get(field, "") for field in FINGERPRINT_FIELDS] for elem in dom_elements]
+    encoded = json.dumps(compact, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+class ScreenshotCache:
+    """
+    LRU + TTL cache of page analyses.
+    Key: (DOM fingerprint, perceptual hash of the screenshot). A lookup hits when
+    the DOM fingerprint matches exactly and the hashes differ by at most
+    max_distance bits.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0, max_distance: int = 4):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._by_dom: Dict[str, set] = {}  # dom fingerprint -> phashes stored for it
+
+        self.hits = 0
+        self.near_hits = 0  # hits that matched on Hamming distance > 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, phash: int, dom_fp: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Return (analysis copy, hamming distance) or None"""
+        now = time.monotonic()
+        best_key, best_distance = None, self.max_distance + 1
+
+        for stored_hash in list(self._by_dom.get(dom_fp, ())):
+            key = (dom_fp, stored_hash)
+            created, _ = self._entries[key]
+            if now - created > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                continue
+
+            distance = (stored_hash ^ phash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+                if distance == 0:
+                    break
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_key)
+        self.hits += 1
+        if best_distance:
+            self.near_hits += 1
+        return copy.deepcopy(self._entries[best_key][1]), best_distance
+
+    def put(self, phash: int, dom_fp: str, analysis: Dict[str, Any]):
+        key = (dom_fp, phash)
+        self._entries[key] = (time.monotonic(), copy.deepcopy(analysis))
+        self._entries.move_to_end(key)
+        self._by_dom.setdefault(dom_fp, set()).add(phash)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, int]):
+        self._entries.pop(key, None)
+        dom_fp, phash = key
+        hashes = self._by_dom.get(dom_fp)
+        if hashes is not None:
+            hashes.discard(phash)
+            if not hashes:
+                del self._by_dom[dom_fp]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_dom.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -3,6 +3,7 @@ import io
 from PIL import Image
 import numpy as np
 import cv2
+from .image_pipeline import prepare_image, prepare_image_bytes, VisionGrid
 
 class ScreenshotProcessor:
     @staticmethod
@@ -23,32 +24,21 @@ class ScreenshotProcessor:
         return image
     
     @staticmethod
-    def preprocess_image_for_llm(image: Image.Image) -> dict:
+    def preprocess_image_for_llm(image: Image.Image, grid: VisionGrid = None) -> dict:
         """Prepare image for Ollama vision model"""
         # Ollama needs images in base64 format
+        # Same convert → resize → JPEG steps as main.image_to_base64
+        # grid: model patch grid, so the size lands on whole vision tokens
+        return prepare_image(image, max_size=1024, grid=grid)
+    
+    @staticmethod
+    def prepare_base64_for_llm(base64_string: str, grid: VisionGrid = None) -> dict:
+        """Decode + preprocess in one call, so it can run on the image executor"""
+        if base64_string.startswith('data:image'):
+            base64_string = base64_string.split(',')[1]
         
-        # 1. Ensure RGB format (not RGBA, grayscale, etc.)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # 2. Resize if too large (Ollama works better with smaller images)
-        max_size = 1024  # Maximum dimension
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-        
-        # 3. Convert to base64 for Ollama API
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85)  # Compress
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        return {
-            "image": img_str,  # Base64 string Ollama can understand
-            "width": image.width,
-            "height": image.height,
-            "format": "jpeg"
-        }
+        # Works on the raw bytes so LLM-ready JPEGs can skip re-encoding
+        return prepare_image_bytes(base64.b64decode(base64_string), max_size=1024, grid=grid)
     
     @staticmethod
     def extract_text_regions(image: Image.Image) -> list:
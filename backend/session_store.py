@@ -0,0 +1,411 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import msgpack
+
+from dom_model import CompactSession
+from resp_client import RespClient
+
+TTL = "ttl"
+LRU = "lru"
+MEMORY = "memory"
+BACKENDS = ("memory", "sqlite", "redis", "none")
+
+
+def pack_session(session: Dict[str, Any]) -> bytes:
+    """Compact binary form for shared backends (msgpack of the column-wise CompactSession)"""
+    return msgpack.packb(CompactSession(session).to_columns(), use_bin_type=True)
+
+
+def unpack_session(data: bytes) -> Dict[str, Any]:
+    unpacked = msgpack.unpackb(data, raw=False)
+    if not unpacked.get("compact"):
+        return unpacked  # Stored as a plain dict by an older version
+    return CompactSession.from_columns(unpacked).expand()
+
+
+class SessionStore:
+    """
+    In-memory sessions with bounds (one process only).
+    - idle_ttl: a session not read or written for this long is dropped
+    - max_entries / max_bytes: least recently used sessions are evicted first
+      (sizes are estimated once, when the session is stored)
+    Sessions are held as CompactSessions (column-wise DOM elements, slotted
+    actions); get() returns a fresh dict, so put() it back after changing it.
+    Ids of recently evicted sessions are remembered, so callers can tell an
+    expired session from one that never existed.
+    All backends share this async interface: get / put / delete /
+    evicted_reason / stats / close.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 idle_ttl: float = 1800.0, remember_evicted: int = 10_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.remember_evicted = remember_evicted
+
+        # session_id -> (session, size, last access); least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._evicted: "OrderedDict[str, str]" = OrderedDict()  # session_id -> reason
+        self.bytes = 0
+        self.evictions = {TTL: 0, LRU: 0, MEMORY: 0}
+        self.on_evict = None  # optional callback(reason), e.g. a metrics counter
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        session, size, last_access = entry
+        now = time.monotonic()
+        if now - last_access > self.idle_ttl:
+            self._evict(session_id, TTL)
+            return None
+        self._entries[session_id] = (session, size, now)
+        self._entries.move_to_end(session_id)
+        return session.expand()
+
+    async def put(self, session_id: str, session: Dict[str, Any]):
+        """Store (or replace) a session; call again after mutating one to refresh its size"""
+        old = self._entries.pop(session_id, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._evicted.pop(session_id, None)
+
+        compact = CompactSession(session)
+        size = compact.nbytes()
+        self._entries[session_id] = (compact, size, time.monotonic())
+        self.bytes += size
+        self._enforce_bounds()
+
+    async def delete(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    async def evicted_reason(self, session_id: str) -> Optional[str]:
+        """Why a recently seen session is gone (ttl/lru/memory), None if unknown"""
+        if session_id in self._entries:
+            await self.get(session_id)  # may expire it right now
+        return self._evicted.get(session_id)
+
+    def _evict(self, session_id: str, reason: str):
+        session, size, _ = self._entries.pop(session_id)
+        self.bytes -= size
+        self.evictions[reason] += 1
+        self._evicted[session_id] = reason
+        if len(self._evicted) > self.remember_evicted:
+            self._evicted.popitem(last=False)
+        if self.on_evict is not None:
+            self.on_evict(reason)
+
+    def _enforce_bounds(self):
+        # Idle sessions sit at the front (least recently used), so stop at the first live one
+        now = time.monotonic()
+        while self._entries:
+            session_id, (_, _, last_access) = next(iter(self._entries.items()))
+            if now - last_access <= self.idle_ttl:
+                break
+            self._evict(session_id, TTL)
+
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), LRU)
+
+        # Never evict the session that was just stored
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)), MEMORY)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes_estimate": self.bytes,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": dict(self.evictions)
+        }
+
+    async def close(self):
+        pass
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a local SQLite file (WAL mode), shared by every worker process
+    on the host. Same bounds as SessionStore; sizes are the packed byte counts.
+    Queries run on one dedicated thread so the event loop never waits on disk.
+    """
+
+    backend = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+    CREATE TABLE IF NOT EXISTS evicted_sessions (
+        id TEXT PRIMARY KEY,
+        reason TEXT NOT NULL,
+        evicted_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS evicted_sessions_at ON evicted_sessions (evicted_at);
+    """
+
+    def __init__(self, path: str = "sessions.db", max_entries: int = 1000,
+                 max_bytes: int = 64 * 1024 * 1024, idle_ttl: float = 1800.0,
+                 remember_evicted: int = 10_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.remember_evicted = remember_evicted
+        self.evictions = {TTL: 0, LRU: 0, MEMORY: 0}  # done by this process
+        self.on_evict = None
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions")
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # Durable enough for sessions, much faster commits
+            db.executescript(self.SCHEMA)
+            self._db = db
+        return self._db
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _evict_rows(self, db: sqlite3.Connection, ids, reason: str, now: float):
+        if not ids:
+            return
+        db.executemany("DELETE FROM sessions WHERE id = ?", [(i,) for i in ids])
+        db.executemany(
+            "INSERT OR REPLACE INTO evicted_sessions (id, reason, evicted_at) VALUES (?, ?, ?)",
+            [(i, reason, now) for i in ids]
+        )
+        self.evictions[reason] += len(ids)
+        if self.on_evict is not None:
+            for _ in ids:
+                self.on_evict(reason)
+
+    def _get(self, session_id: str) -> Optional[bytes]:
+        db = self._connect()
+        now = time.time()
+        row = db.execute("SELECT data, last_access FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        data, last_access = row
+        if now - last_access > self.idle_ttl:
+            db.execute("BEGIN IMMEDIATE")
+            self._evict_rows(db, [session_id], TTL, now)
+            db.execute("COMMIT")
+            return None
+        db.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+        return data
+
+    def _put(self, session_id: str, data: bytes):
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, size, last_access) VALUES (?, ?, ?, ?)",
+                (session_id, data, len(data), now)
+            )
+            db.execute("DELETE FROM evicted_sessions WHERE id = ?", (session_id,))
+
+            expired = [r[0] for r in db.execute(
+                "SELECT id FROM sessions WHERE last_access < ?", (now - self.idle_ttl,))]
+            self._evict_rows(db, expired, TTL, now)
+
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+            if count > self.max_entries:
+                lru = [r[0] for r in db.execute(
+                    "SELECT id FROM sessions ORDER BY last_access LIMIT ?", (count - self.max_entries,))]
+                self._evict_rows(db, lru, LRU, now)
+                total = db.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+
+            if total > self.max_bytes:
+                victims = []
+                for victim_id, size in db.execute(
+                        "SELECT id, size FROM sessions WHERE id != ? ORDER BY last_access", (session_id,)):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append(victim_id)
+                    total -= size
+                self._evict_rows(db, victims, MEMORY, now)
+
+            # Keep the tombstone table bounded too
+            db.execute(
+                "DELETE FROM evicted_sessions WHERE id IN (SELECT id FROM evicted_sessions "
+                "ORDER BY evicted_at DESC LIMIT -1 OFFSET ?)", (self.remember_evicted,)
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _delete(self, session_id: str):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def _evicted_reason(self, session_id: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT reason FROM evicted_sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def _stats(self) -> tuple:
+        return self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._run(self._get, session_id)
+        return unpack_session(data) if data is not None else None
+
+    async def put(self, session_id: str, session: Dict[str, Any]):
+        await self._run(self._put, session_id, pack_session(session))
+
+    async def delete(self, session_id: str):
+        await self._run(self._delete, session_id)
+
+    async def evicted_reason(self, session_id: str) -> Optional[str]:
+        if await self.get(session_id) is not None:
+            return None
+        return await self._run(self._evicted_reason, session_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        count, total = await self._run(self._stats)
+        return {
+            "backend": self.backend,
+            "path": self.path,
+            "entries": count,
+            "max_entries": self.max_entries,
+            "bytes_estimate": total,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": dict(self.evictions)
+        }
+
+    async def close(self):
+        def _close():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        await self._run(_close)
+        self._executor.shutdown(wait=True)
+
+
+class RedisSessionStore:
+    """
+    Sessions in Redis (or anything speaking RESP), shared across hosts.
+    Idle TTL is the key's expiry, refreshed on every read (GETEX).
+    Entry/memory bounds and eviction counts are Redis' job (maxmemory + an LRU
+    policy, INFO stats); a dropped session reads as expired here. A longer-lived marker key records
+    that a session existed, so an expired session can be told from an unknown one.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", idle_ttl: float = 1800.0,
+                 remember_for: float = 86400.0, prefix: str = "a11y:session:"):
+        self.client = RespClient.from_url(url)
+        self.url = url
+        self.idle_ttl = idle_ttl
+        self.remember_for = remember_for
+        self.prefix = prefix
+        self.on_evict = None  # Evictions happen inside Redis; kept for interface parity
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def _seen_key(self, session_id: str) -> str:
+        return f"{self.prefix}seen:{session_id}"
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.client.execute("GETEX", self._key(session_id), "PX", int(self.idle_ttl * 1000))
+        return unpack_session(data) if data is not None else None
+
+    async def put(self, session_id: str, session: Dict[str, Any]):
+        await self.client.pipeline(
+            ("SET", self._key(session_id), pack_session(session), "PX", int(self.idle_ttl * 1000)),
+            ("SET", self._seen_key(session_id), b"1", "PX", int(self.remember_for * 1000))
+        )
+
+    async def delete(self, session_id: str):
+        await self.client.execute("DEL", self._key(session_id))
+
+    async def evicted_reason(self, session_id: str) -> Optional[str]:
+        live, seen = await self.client.pipeline(
+            ("EXISTS", self._key(session_id)), ("EXISTS", self._seen_key(session_id)))
+        if live or not seen:
+            return None
+        return TTL
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "url": self.client.address,
+            "db_keys": await self.client.execute("DBSIZE"),
+            "idle_ttl_seconds": self.idle_ttl
+        }
+
+    async def close(self):
+        await self.client.close()
+
+
+class NullSessionStore:
+    """
+    Keeps nothing: for stateless deployments where clients carry signed
+    session tokens (see session_token.py) and any replica serves any request.
+    """
+
+    backend = "none"
+
+    def __init__(self):
+        self.on_evict = None
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def put(self, session_id: str, session: Dict[str, Any]):
+        pass
+
+    async def delete(self, session_id: str):
+        pass
+
+    async def evicted_reason(self, session_id: str) -> Optional[str]:
+        return None
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend}
+
+    async def close(self):
+        pass
+
+
+def create_session_store(backend: str = "memory", max_entries: int = 1000,
+                         max_bytes: int = 64 * 1024 * 1024, idle_ttl: float = 1800.0,
+                         sqlite_path: str = "sessions.db", redis_url: str = "redis://localhost:6379/0"):
+    """
+    Session backend by name: "memory" (one process), "sqlite" (one host),
+    "redis" (many hosts) or "none" (stateless, session tokens only)
+    """
+    if backend == "memory":
+        return SessionStore(max_entries=max_entries, max_bytes=max_bytes, idle_ttl=idle_ttl)
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, max_entries=max_entries, max_bytes=max_bytes, idle_ttl=idle_ttl)
+    if backend == "redis":
+        return RedisSessionStore(redis_url, idle_ttl=idle_ttl)
+    if backend == "none":
+        return NullSessionStore()
+    raise ValueError(f"Unknown session backend: {backend} (expected one of {BACKENDS})")
@@ -0,0 +1,113 @@
+import base64
+import hashlib
+import hmac
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+import msgpack
+
+VERSION = b"v1"
+MAX_TOKEN_CHARS = 64 * 1024
+MAX_PAYLOAD_BYTES = 256 * 1024  # Decompressed; guards against zip bombs
+
+ANALYSIS_FIELDS = ("page_type", "page_summary", "actions")
+
+
+class InvalidSessionToken(Exception):
+    """Malformed token or bad signature"""
+
+
+class ExpiredSessionToken(InvalidSessionToken):
+    pass
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def trim_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What /api/interpret-command needs from a session: the analysis without
+    extras, plus only the DOM elements its actions point at (element index -> element)
+    """
+    analysis = session["page_analysis"]
+    elements = session.get("dom_elements") or []
+    trimmed = {key: analysis[key] for key in ANALYSIS_FIELDS if key in analysis}
+    referenced = {}
+    for action in trimmed.get("actions", []):
+        idx = action.get("element_index")
+        if isinstance(idx, int) and 0 <= idx < len(elements):
+            referenced[idx] = elements[idx]
+    return {"page_analysis": trimmed, "dom_elements": referenced}
+
+
+class SessionTokens:
+    """
+    Stateless sessions: the trimmed session travels with the client as
+    v1.<payload>.<signature>, where payload is base64url(zlib(msgpack)) and
+    signature is base64url(HMAC-SHA256(secret, "v1." + payload)).
+    Any replica with the same secret can read a token; nothing is kept server side.
+    Tokens are signed, not encrypted: the client can read (but not change) them.
+    """
+
+    def __init__(self, secret: str, ttl: float = 1800.0):
+        if not secret:
+            raise ValueError("Session tokens need a secret")
+        self.key = secret.encode()
+        self.ttl = ttl
+        self.issued = 0
+        self.rejected = {"invalid": 0, "expired": 0}
+
+    def _sign(self, signed: bytes) -> bytes:
+        return _b64encode(hmac.new(self.key, signed, hashlib.sha256).digest())
+
+    def issue(self, session: Dict[str, Any], now: Optional[float] = None) -> str:
+        expires = int((now or time.time()) + self.ttl)
+        payload = msgpack.packb({"exp": expires, "session": trim_session(session)}, use_bin_type=True)
+        signed = VERSION + b"." + _b64encode(zlib.compress(payload, 6))
+        self.issued += 1
+        return (signed + b"." + self._sign(signed)).decode()
+
+    def read(self, token: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """The session inside a token; raises InvalidSessionToken / ExpiredSessionToken"""
+        try:
+            return self._read(token, now)
+        except ExpiredSessionToken:
+            self.rejected["expired"] += 1
+            raise
+        except InvalidSessionToken:
+            self.rejected["invalid"] += 1
+            raise
+
+    def _read(self, token: str, now: Optional[float]) -> Dict[str, Any]:
+        if len(token) > MAX_TOKEN_CHARS:
+            raise InvalidSessionToken("Token too large")
+        signed, _, signature = token.encode().rpartition(b".")
+        if not signed.startswith(VERSION + b"."):
+            raise InvalidSessionToken("Unknown token format")
+        if not hmac.compare_digest(self._sign(signed), signature):
+            raise InvalidSessionToken("Bad signature")
+
+        try:
+            decompressor = zlib.decompressobj()
+            payload = decompressor.decompress(_b64decode(signed[len(VERSION) + 1:]), MAX_PAYLOAD_BYTES)
+            if decompressor.unconsumed_tail:
+                raise InvalidSessionToken("Token payload too large")
+            data = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+            expires, session = data["exp"], data["session"]
+        except InvalidSessionToken:
+            raise
+        except Exception as e:
+            raise InvalidSessionToken(f"Unreadable token: {e}")
+
+        if (now or time.time()) > expires:
+            raise ExpiredSessionToken("Token expired")
+        return session
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ttl_seconds": self.ttl, "issued": self.issued, "rejected": dict(self.rejected)}
@@ -0,0 +1,73 @@
+import asyncio
+import copy
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+def content_key(image_base64: str, dom_elements: List[Dict]) -> str:
+    """Exact-content key for a (screenshot, DOM) analysis request"""
+    digest = hashlib.blake2b(image_base64.encode(), digest_size=16)
+    digest.update(json.dumps(dom_elements, sort_keys=True, separators=(",", ":")).encode())
+    return digest.hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+    The first caller starts the work as a task; later callers with the same key
+    await that same task. The work is only cancelled when every waiter has gone
+    away, so one client disconnecting never kills another client's result.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0      # executions actually run
+        self.coalesced = 0    # callers that joined an execution already in flight
+        self.cancelled = 0    # executions abandoned by all their waiters
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        flight = self._flights.get(key)
+        leader = flight is None
+
+        if leader:
+            flight = _Flight(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: cancelling this waiter must not cancel the shared task
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+                self.cancelled += 1
+
+        # Followers get their own copy so callers can mutate results freely
+        return result if leader else copy.deepcopy(result)
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled
+        }
@@ -0,0 +1,88 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ActionStreamParser:
+    """
+    Incremental parser for the analysis JSON as Ollama streams it.
+    feed() takes text chunks and returns every action object in the top-level
+    "actions" array that has been fully received so far; the whole completion
+    stays available in .text for the final parse.
+    Text outside the JSON (```json fences, chatter) is ignored.
+    """
+
+    def __init__(self, array_key: str = "actions"):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+
+        self._stack: List[str] = []   # open '{' / '[' containers
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None      # most recently closed string (key candidate)
+        self._last_key = None         # key of the value being parsed in the current object
+        self._array_depth = None      # stack depth of the actions array (0 once it has closed)
+        self._item_start = None       # index of the '{' of the action being received
+        self.actions_emitted = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk, return newly completed actions"""
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if not self._stack and ch != '{':
+                continue  # prose / code fences before the JSON
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ':':
+                self._last_key = self._last_string
+            elif ch == ',':
+                self._last_key = None
+            elif ch in '{[':
+                if self._array_depth is not None and len(self._stack) == self._array_depth and ch == '{':
+                    self._item_start = i
+                self._stack.append(ch)
+                if (ch == '[' and self._array_depth is None and len(self._stack) == 2
+                        and self._last_key == self.array_key):
+                    self._array_depth = len(self._stack)
+                self._last_key = None
+            elif ch in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if ch == ']' and len(self._stack) == (self._array_depth or 0) - 1:
+                    self._array_depth = 0  # actions array closed; ignore later arrays
+                if (ch == '}' and self._item_start is not None
+                        and len(self._stack) == self._array_depth):
+                    action = self._parse_item(text[self._item_start:i + 1])
+                    if action is not None:
+                        completed.append(action)
+                    self._item_start = None
+
+        self._pos = len(text)
+        self.actions_emitted += len(completed)
+        return completed
+
+    @staticmethod
+    def _parse_item(fragment: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -0,0 +1,117 @@
+"""
+OllamaPool against real HTTP: benchmarks/fake_ollama.py servers plus a port
+nobody listens on. Run from the backend folder:
+    uv run pytest test_ollama_pool.py
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from http_client import DeadlineExceeded
+from ollama_pool import NoHealthyBackend, OllamaPool
+
+
+@pytest.fixture(scope="module")
+def live_urls(fake_ollama):
+    return [fake_ollama(), fake_ollama()]
+
+
+async def generate(pool: OllamaPool, client: httpx.AsyncClient) -> str:
+    """One non-streaming call through the pool; returns the backend URL it went to"""
+    async with pool.request() as backend:
+        response = await client.post(f"{backend.url}/api/generate",
+                                     json={"model": "qwen2.5vl:7b", "prompt": "hi", "stream": False})
+        response.raise_for_status()
+        return backend.url
+
+
+async def attempt(pool: OllamaPool, client: httpx.AsyncClient):
+    """generate(), with connection errors returned instead of raised"""
+    try:
+        return await generate(pool, client)
+    except httpx.HTTPError as e:
+        return e
+
+
+def test_least_outstanding_spreads_concurrent_requests(live_urls):
+    async def run():
+        pool = OllamaPool(live_urls)
+        async with httpx.AsyncClient(timeout=10) as client:
+            routed = await asyncio.gather(*(generate(pool, client) for _ in range(6)))
+        return pool, routed
+
+    pool, routed = asyncio.run(run())
+    assert sorted(routed) == sorted(live_urls * 3)
+    assert all(b.outstanding == 0 and b.failures == 0 for b in pool.backends)
+
+
+def test_dead_backend_is_ejected(live_urls, dead_port):
+    dead_url = f"http://127.0.0.1:{dead_port}"
+
+    async def run():
+        # The dead backend is listed first, so ties are routed to it until it is ejected
+        pool = OllamaPool([dead_url, live_urls[0]], eject_after=2, cooldown=60)
+        async with httpx.AsyncClient(timeout=5) as client:
+            results = [await attempt(pool, client) for _ in range(6)]
+        return pool, results
+
+    pool, results = asyncio.run(run())
+    dead, live = pool.backends
+    assert all(isinstance(r, httpx.ConnectError) for r in results[:2])
+    assert results[2:] == [live_urls[0]] * 4
+    assert not dead.healthy and dead.ejections == 1 and dead.failures == 2
+    assert live.healthy and live.requests == 4 and pool.healthy_count() == 1
+
+
+def test_probe_readmits_a_backend_that_comes_back(fake_ollama, dead_port):
+    url = f"http://127.0.0.1:{dead_port}"
+
+    async def run():
+        pool = OllamaPool([url], eject_after=2, probe_timeout=1)
+        async with httpx.AsyncClient(timeout=5) as client:
+            assert await pool.probe_all(client) == [False]
+            assert await pool.probe_all(client) == [False]
+            ejected = not pool.backends[0].healthy
+            await asyncio.to_thread(fake_ollama, dead_port)
+            probed = await pool.probe_all(client)
+            routed = await generate(pool, client)
+        return pool, ejected, probed, routed
+
+    pool, ejected, probed, routed = asyncio.run(run())
+    assert ejected
+    assert probed == [True] and routed == url
+    assert pool.backends[0].healthy and pool.backends[0].consecutive_failures == 0
+
+
+def test_trial_request_after_cooldown_readmits(fake_ollama, dead_port):
+    url = f"http://127.0.0.1:{dead_port}"
+
+    async def run():
+        pool = OllamaPool([url], eject_after=1, cooldown=0.5)
+        async with httpx.AsyncClient(timeout=5) as client:
+            assert isinstance(await attempt(pool, client), httpx.ConnectError)
+            with pytest.raises(NoHealthyBackend):
+                await generate(pool, client)  # still cooling down
+            await asyncio.to_thread(fake_ollama, dead_port)
+            await asyncio.sleep(max(0.0, pool.backends[0].retry_at - time.monotonic()))
+            routed = await generate(pool, client)  # the trial request
+        return pool, routed
+
+    pool, routed = asyncio.run(run())
+    assert routed == url
+    assert pool.backends[0].healthy and pool.backends[0].ejections == 1
+
+
+def test_excluded_errors_do_not_count_as_failures(live_urls):
+    async def run():
+        pool = OllamaPool(live_urls[:1], eject_after=1, excluded=(DeadlineExceeded,))
+        for _ in range(3):
+            with pytest.raises(DeadlineExceeded):
+                async with pool.request():
+                    raise DeadlineExceeded("caller's deadline")
+        return pool
+
+    backend = asyncio.run(run()).backends[0]
+    assert backend.healthy and backend.failures == 0 and backend.requests == 0
@@ -0,0 +1,99 @@
+"""
+OllamaScheduler admission control. Run from the backend folder:
+    uv run pytest test_ollama_scheduler.py
+"""
+import asyncio
+
+import pytest
+
+from ollama_scheduler import OllamaScheduler, SchedulerOverloaded
+
+
+async def hold(scheduler: OllamaScheduler, release: asyncio.Event, deadline: float = 30.0):
+    async with scheduler.slot(deadline):
+        await release.wait()
+
+
+def test_idle_scheduler_admits_a_deadline_shorter_than_the_estimate():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, initial_service_time=8.0)
+        async with scheduler.slot(2.0) as remaining:
+            return scheduler, remaining
+
+    scheduler, remaining = asyncio.run(run())
+    assert 1.9 < remaining <= 2.0
+    assert scheduler.admitted == 1 and scheduler.rejected_deadline == 0
+
+
+def test_max_queue_zero_admits_when_a_slot_is_free():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, max_queue=0)
+        for _ in range(3):
+            async with scheduler.slot():
+                pass
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.completed == 3 and scheduler.rejected_queue_full == 0
+
+
+def test_max_queue_zero_rejects_when_it_would_have_to_wait():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, max_queue=0)
+        release = asyncio.Event()
+        busy = asyncio.create_task(hold(scheduler, release))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(SchedulerOverloaded) as rejected:
+                async with scheduler.slot():
+                    pass
+        finally:
+            release.set()
+            await busy
+        return scheduler, rejected.value
+
+    scheduler, error = asyncio.run(run())
+    assert error.reason == "queue_full"
+    assert scheduler.rejected_queue_full == 1 and scheduler.completed == 1
+
+
+def test_queued_request_is_rejected_when_the_estimate_overruns_its_deadline():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, initial_service_time=8.0)
+        release = asyncio.Event()
+        busy = asyncio.create_task(hold(scheduler, release))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(SchedulerOverloaded) as rejected:
+                async with scheduler.slot(2.0):
+                    pass
+        finally:
+            release.set()
+            await busy
+        return scheduler, rejected.value
+
+    scheduler, error = asyncio.run(run())
+    assert error.reason == "deadline"
+    assert scheduler.rejected_deadline == 1
+
+
+def test_queued_request_gets_the_slot_when_it_frees_up():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, initial_service_time=0.1)
+        release = asyncio.Event()
+        busy = asyncio.create_task(hold(scheduler, release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold(scheduler, asyncio.Event(), deadline=5.0))
+        await asyncio.sleep(0)
+        waiting = scheduler.waiting
+        release.set()
+        await busy
+        await asyncio.sleep(0)
+        active = scheduler.active
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        return scheduler, waiting, active
+
+    scheduler, waiting, active = asyncio.run(run())
+    assert waiting == 1 and active == 1
+    assert scheduler.admitted == 2 and scheduler.expired_in_queue == 0
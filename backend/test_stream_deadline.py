@@ -0,0 +1,71 @@
+"""
+/api/analyze-page-stream against a slow benchmarks/fake_ollama.py (5 tokens/s):
+on a fresh process a 2 s deadline is admitted and the stream ends at the deadline.
+Run from the backend folder:
+    uv run pytest test_stream_deadline.py
+"""
+import importlib
+import io
+import json
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+DOM_ELEMENTS = [
+    {"index": 0, "tag": "input", "type": "search", "text": "", "placeholder": "Search",
+     "bounds": {"x": 100, "y": 20, "width": 400, "height": 40}},
+    {"index": 1, "tag": "button", "type": "submit", "text": "Search",
+     "bounds": {"x": 510, "y": 20, "width": 80, "height": 40}},
+    {"index": 2, "tag": "a", "text": "Cart", "bounds": {"x": 900, "y": 20, "width": 60, "height": 30}},
+]
+
+
+@pytest.fixture(scope="module")
+def app_module(fake_ollama):
+    url = fake_ollama(ttft=0.05, tokens_per_sec=5)
+    env = {"OLLAMA_BASE_URL": url, "OLLAMA_BASE_URLS": "[]", "OLLAMA_WARMUP_ENABLED": "false",
+           "SESSION_BACKEND": "memory", "SCREENSHOT_CACHE_ENABLED": "false"}
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    sys.modules.pop("main", None)
+    try:
+        yield importlib.import_module("main")
+    finally:
+        sys.modules.pop("main", None)
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def screenshot() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 200), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_short_deadline_is_admitted_and_bounds_a_slow_stream(app_module):
+    with TestClient(app_module.app) as client:
+        started = time.monotonic()
+        response = client.post(
+            "/api/analyze-page-stream",
+            files={"screenshot": ("page.png", screenshot(), "image/png")},
+            data={"dom_elements": json.dumps(DOM_ELEMENTS), "deadline_seconds": "2"}
+        )
+        elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert events[-1]["type"] == "done"
+    stats = app_module.ollama_scheduler.stats()
+    # Admitted on an idle scheduler despite the 8 s initial estimate...
+    assert stats["admitted"] == 1 and stats["rejected_deadline"] == 0
+    # ...and cut off by the deadline: the full answer would take well over 10 s at 5 tokens/s
+    assert 1.9 <= elapsed < 3.5
+    analysis = events[-1]["analysis"]
+    assert analysis.get("fallback") or analysis.get("partial")
@@ -118,20 +118,26 @@ class A11yOverlay {
             // Capture DOM elements
             const domElements = this.captureDomElements();
             
-            // Send to backend
-            const response = await this.sendToBackend('/api/analyze-page', {
+            // Send to backend - streamed, so each action shows up as soon as it's ready
+            this.state.actions = [];
+            await this.streamFromBackend('/api/analyze-page-stream', {
                 screenshot: screenshot,
                 dom_elements: JSON.stringify(domElements),
                 url: window.location.href
+            }, (event) => {
+                if (event.type === 'session') {
+                    this.state.sessionId = event.session_id;
+                } else if (event.type === 'action') {
+                    this.state.actions.push(event.action);
+                    this.displayActions(this.state.actions);
+                } else if (event.type === 'done') {
+                    // Final analysis is authoritative
+                    this.state.currentPage = event.analysis;
+                    this.state.actions = event.analysis.actions || [];
+                    this.displayActions(this.state.actions);
+                }
             });
             
-            this.state.sessionId = response.session_id;
-            this.state.currentPage = response.analysis;
-            this.state.actions = response.analysis.actions || [];
-            
-            // Display actions
-            this.displayActions(this.state.actions);
-            
             // Reset button
             analyzeBtn.innerHTML = originalText;
             analyzeBtn.disabled = false;
@@ -422,7 +428,37 @@ class A11yOverlay {
         }
     }
     
-    async sendToBackend(endpoint, data) {
+    async streamFromBackend(endpoint, data, onEvent) {
+        // Reads an NDJSON response line by line and hands each event to onEvent
+        const response = await fetch(this.config.backendUrl + endpoint, {
+            method: 'POST',
+            body: this.buildFormData(data)
+        });
+        
+        if (!response.ok) {
+            throw new Error(`Backend error: ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+        }
+        
+        if (buffer.trim()) {
+            onEvent(JSON.parse(buffer));
+        }
+    }
+    
+    buildFormData(data) {
         const formData = new FormData();
         
         Object.keys(data).forEach(key => {
@@ -434,9 +470,13 @@ class A11yOverlay {
             }
         });
         
+        return formData;
+    }
+    
+    async sendToBackend(endpoint, data) {
         const response = await fetch(this.config.backendUrl + endpoint, {
             method: 'POST',
-            body: formData
+            body: this.buildFormData(data)
         });
         
         if (!response.ok) {